@@ -0,0 +1,187 @@
+"""
+AI提示客户端
+- 共享连接池的 requests.Session，避免每次提示都重新建立连接
+- 后台线程池执行请求，线程数即全局并发上限，Flask工作线程只需等待结果
+- 相同盘面的并发请求合并为一次上游调用
+- 按 (阶数, 规范化盘面) 缓存提示结果，带过期时间和LRU淘汰
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from hints import parse_state
+import metrics
+
+
+def normalize_state(n, current_state):
+    """把盘面规范化为字符串，用作缓存和合并请求的键"""
+    grid = parse_state(n, current_state)
+    if grid is None:
+        return json.dumps(current_state, sort_keys=True, ensure_ascii=False)
+    return ','.join(str(cell) for row in grid for cell in row)
+
+
+class HintClient:
+    """
+    AI提示客户端
+    :param api_url: AI接口地址
+    :param api_key: API密钥
+    :param model: 模型名称
+    :param max_tokens: 最大生成长度
+    :param timeout: 单次上游请求超时（秒）
+    :param max_concurrent: 同时进行的上游请求上限
+    :param cache_size: 缓存的提示数量上限
+    :param cache_ttl: 缓存的有效期（秒）
+    :param error_ttl: 失败结果的保留时间（秒），便于轮询方看到错误，过期后重新请求上游
+    """
+
+    def __init__(self, api_url, api_key, model, max_tokens=200, timeout=30,
+                 max_concurrent=4, cache_size=512, cache_ttl=600, error_ttl=5):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.model = model
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.error_ttl = error_ttl
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_concurrent, pool_maxsize=max_concurrent)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        })
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='hint')
+        self._lock = threading.RLock()  # 请求已完成时回调会在提交线程中立即执行，需要可重入
+        self._inflight = {}  # 键 -> Future，正在进行的上游请求
+        self._cache = OrderedDict()  # 键 -> (过期时间, 结果)
+        self._tickets = {}  # 票据 -> 键，用于之后查询结果
+
+    @staticmethod
+    def ticket_of(key):
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+
+    def submit(self, n, current_state, prompt):
+        """
+        提交一次提示请求，立即返回 (票据, Future)
+        命中缓存时返回已完成的Future，相同盘面正在请求时返回同一个Future
+        """
+        key = (int(n), normalize_state(int(n), current_state))
+        ticket = self.ticket_of(key)
+        with self._lock:
+            cached = self._cache_get(key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return ticket, future
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._call, prompt)
+                self._inflight[key] = future
+                future.add_done_callback(lambda done, key=key: self._finish(key, done))
+            self._tickets[ticket] = key
+            while len(self._tickets) > self.cache_size:
+                self._tickets.pop(next(iter(self._tickets)))
+        return ticket, future
+
+    def lookup(self, ticket):
+        """
+        按票据查询结果
+        :return: 结果字典；仍在请求中返回 {'pending': True}；未知票据返回None
+        """
+        with self._lock:
+            key = self._tickets.get(ticket)
+            if key is None:
+                return None
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+            future = self._inflight.get(key)
+        if future is None:
+            return None
+        if not future.done():
+            return {'pending': True}
+        return future.result()
+
+    def watch(self, ticket):
+        """
+        按票据取得可以等待的Future，用于结果就绪时推送给客户端
+        :return: 已缓存时返回已完成的Future，正在请求时返回上游请求的Future，未知票据返回None
+        """
+        with self._lock:
+            key = self._tickets.get(ticket)
+            if key is None:
+                return None
+            cached = self._cache_get(key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future
+            return self._inflight.get(key)
+
+    def _cache_get(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires, result = entry
+        if expires < time.time():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return result
+
+    def _finish(self, key, future):
+        """上游请求结束：结果写入缓存，失败的结果只短暂保留"""
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'success': False, 'error': f'获取提示失败: {str(e)}'}
+        ttl = self.cache_ttl if result.get('success') else self.error_ttl
+        with self._lock:
+            self._cache[key] = (time.time() + ttl, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self._inflight.pop(key, None)
+
+    def _call(self, prompt):
+        """调用上游AI接口（在线程池中执行）"""
+        payload = {
+            'model': self.model,
+            'messages': [
+                {'role': 'user', 'content': prompt}
+            ],
+            'max_tokens': self.max_tokens,
+            'temperature': 0.7
+        }
+        started = time.time()
+        try:
+            response = self.session.post(self.api_url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            metrics.HINT_UPSTREAM_SECONDS.observe(time.time() - started)
+            metrics.HINT_UPSTREAM_ERRORS.inc(reason='network')
+            return {'success': False, 'error': f'获取提示失败: {str(e)}'}
+        metrics.HINT_UPSTREAM_SECONDS.observe(time.time() - started)
+        if response.status_code != 200:
+            metrics.HINT_UPSTREAM_ERRORS.inc(reason='status')
+            return {'success': False, 'error': f'AI API调用失败: {response.status_code}'}
+        try:
+            hint = response.json()['choices'][0]['message']['content']
+        except (ValueError, KeyError, IndexError):
+            metrics.HINT_UPSTREAM_ERRORS.inc(reason='format')
+            return {'success': False, 'error': 'AI API响应格式异常'}
+        return {'success': True, 'source': 'ai', 'hint': hint}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
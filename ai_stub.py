@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+本地AI接口桩服务
+模拟兼容OpenAI格式的 chat/completions 接口，用于离线测试提示功能和压测
+用法: python ai_stub.py [--port 8001] [--delay 0.5] [--error-rate 0]
+然后把 config.py 中 AI_CONFIG['api_url'] 设置为 http://127.0.0.1:8001/v1/chat/completions
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """处理 chat/completions 请求，按配置延迟后返回固定格式的回复"""
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            payload = {}
+
+        server = self.server
+        with server.lock:
+            server.calls += 1
+        time.sleep(server.delay)
+
+        if random.random() < server.error_rate:
+            self._send(500, {'error': {'message': 'stub error'}})
+            return
+        prompt = ''
+        if payload.get('messages'):
+            prompt = payload['messages'][-1].get('content', '')
+        self._send(200, {
+            'id': f'stub-{server.calls}',
+            'object': 'chat.completion',
+            'model': payload.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': f'我建议先从候选数最少的格子入手。（本地桩服务，提示词长度 {len(prompt)}）'},
+                'finish_reason': 'stop'
+            }]
+        })
+
+    def _send(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # 压测时不输出每条请求日志
+
+
+def start_stub_server(host='127.0.0.1', port=0, delay=0.0, error_rate=0.0):
+    """
+    在后台线程启动桩服务
+    :param port: 端口，0表示随机分配
+    :return: (服务器对象, 接口URL)，服务器对象的 calls 属性记录收到的请求数
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.error_rate = error_rate
+    server.calls = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f'http://{host}:{server.server_address[1]}/v1/chat/completions'
+    return server, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地AI接口桩服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=0.5, help='每个请求的模拟延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回500错误的比例')
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.host, args.port, args.delay, args.error_rate)
+    print(f"AI桩服务已启动: {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,32 @@
-from flask import Flask, render_template, request
-import subprocess
+from flask import Flask, render_template, request, Response, url_for
 import os
 import config
 import json
 import threading
 import time
-from collections import deque
+import atexit
+import random
+import hashlib
+import logging
+from collections import OrderedDict
 from queue import Queue
+from generator_pool import (GeneratorPool, ThreadGeneratorPool, GenerationError, GenerationTimeout,
+                            GenerationOverBudget)
+from transform import derive_puzzles
+from puzzle_bank import PuzzleBank
+from puzzle import Puzzle
+from snapshot import load_snapshot, save_snapshot, snapshot_files, worker_path
+from puzzle_cache import PuzzleCache
+from fingerprint import fingerprint
+from solvers import SearchTimeout, get_backend
+from scheduler import RefillScheduler, SUCCESS_OUTCOMES
+from rating import DIFFICULTIES, DIFFICULTY_NAMES, rate_puzzle
+from hints import find_hint, describe
+from ai_client import HintClient
+import metrics
+from compression import choose_encoding, compress, compress_response
+from tracing import configure_logging, log_event
+from concurrent.futures import TimeoutError as FutureTimeout, wait as wait_futures
 
 app = Flask(__name__)
 
@@ -16,28 +36,124 @@ config_dict = {
     'AI_CONFIG': config.AI_CONFIG
 }
 
+# AI提示客户端（首次使用时创建）
+hint_client = None
+hint_client_lock = threading.Lock()
+
+def get_hint_client():
+    """获取共享的AI提示客户端"""
+    global hint_client
+    with hint_client_lock:
+        if hint_client is None:
+            ai_config = config.AI_CONFIG
+            hint_client = HintClient(
+                ai_config['api_url'],
+                ai_config['api_key'],
+                ai_config['model'],
+                max_tokens=ai_config['max_tokens'],
+                timeout=ai_config.get('timeout', 30),
+                max_concurrent=ai_config.get('max_concurrent', 4),
+                cache_size=ai_config.get('cache_size', 512),
+                cache_ttl=ai_config.get('cache_ttl', 600)
+            )
+        return hint_client
+
+# 生成进程池配置
+GENERATOR_CONFIG = getattr(config, 'GENERATOR_CONFIG', {})
+
 # 缓存配置
-SUPPORTED_SIZES = [4, 9, 16]  # 支持的数独阶数
+SUPPORTED_SIZES = list(GENERATOR_CONFIG.get('sizes', [4, 9, 16]))  # 支持的数独阶数
 CACHE_SIZE = 3  # 每个阶数缓存的数量
+SEED_CACHE_SIZE = 5  # 每个阶数保留的种子数独数量（用于对称变换派生新数独）
+API_MAX_BATCH = 500  # 批量接口单次最多返回的数独数量
+API_WAIT_TIMEOUT = 30  # 批量接口等待新数独生成的最长时间（秒）
+REFRESH_VERIFY_MAX_SIZE = 16  # 刷新提交未知数独时，最多对该阶数做唯一解验证
+REFRESH_VERIFY_TIMEOUT = GENERATOR_CONFIG.get('verify_timeout', 5)  # 唯一解验证的时间上限（秒）
 
-# 缓存数据结构
-sudoku_cache = {
-    size: deque(maxlen=CACHE_SIZE) for size in SUPPORTED_SIZES
+# 每个阶数的内存缓存：缓存的数独、种子数独（真正求解生成的数独，缓存不足时从中派生新数独）
+# 和生成状态由同一把锁保护，缓存为空时请求可以等待正在进行的生成
+puzzle_caches = {
+    size: PuzzleCache(size, CACHE_SIZE, SEED_CACHE_SIZE) for size in SUPPORTED_SIZES
 }
 
-# 缓存状态管理
-cache_status = {
-    size: {
-        'initializing': False,  # 是否正在初始化
-        'generating': False,    # 是否正在后台生成
-        'initialized': False,   # 是否已完成初始化
-        'last_generation_time': 0  # 最后生成时间
-    } for size in SUPPORTED_SIZES
-}
+# 持久化题库配置：多个工作进程共享，重启后库存保留
+BANK_CONFIG = getattr(config, 'BANK_CONFIG', {})
+BANK_TARGET_SIZE = BANK_CONFIG.get('target_per_size', 1000)  # 每个阶数的目标库存量
+BANK_COPIES_PER_CLASS = BANK_CONFIG.get('copies_per_class', 1)  # 每类数独（对称变换等价）在题库中最多保留的份数
+
+puzzle_bank = None
+if BANK_CONFIG.get('enabled', True):
+    puzzle_bank = PuzzleBank(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                          BANK_CONFIG.get('path', 'puzzle_bank.sqlite3')))
+
+# 预热配置：启动时先加载上次退出时保存的缓存快照，再并行补充所有阶数
+WARMUP_CONFIG = getattr(config, 'WARMUP_CONFIG', {})
+SNAPSHOT_PATH = None
+if WARMUP_CONFIG.get('snapshot_path', 'cache_snapshot.json'):
+    SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 WARMUP_CONFIG.get('snapshot_path', 'cache_snapshot.json'))
+SNAPSHOT_INTERVAL = WARMUP_CONFIG.get('snapshot_interval', 60)  # 定期保存快照的间隔（秒），0表示只在退出时保存
+WARMUP_TIMEOUT = WARMUP_CONFIG.get('timeout', 60)  # 每个阶数预热生成的最长时间（秒）
+# 就绪检查要求有库存的阶数，默认全部
+READY_SIZES = [size for size in WARMUP_CONFIG.get('ready_sizes', SUPPORTED_SIZES) if size in SUPPORTED_SIZES]
+
+# 页面和响应压缩配置
+WEB_CONFIG = getattr(config, 'WEB_CONFIG', {})
+RECENT_SOLUTIONS_SIZE = WEB_CONFIG.get('recent_solutions', 4096)  # 记住最近发出的多少个数独的解
+PUZZLE_WAIT_TIMEOUT = WEB_CONFIG.get('puzzle_wait_timeout', 2)  # 没有库存时等待正在生成的数独的最长时间（秒）
+EVENTS_TIMEOUT = WEB_CONFIG.get('events_timeout', 60)  # 事件流（/events）最长保持的时间（秒）
+EVENTS_HEARTBEAT = WEB_CONFIG.get('events_heartbeat', 15)  # 事件流的心跳间隔（秒），避免代理断开空闲连接
+EVENTS_RETRY = WEB_CONFIG.get('events_retry', 5000)  # 连接断开后浏览器重新连接前等待的时间（毫秒）
+
+# 日志和追踪配置：日志以JSON行输出，后台生成的日志附带工作进程的追踪记录
+TRACE_CONFIG = getattr(config, 'TRACE_CONFIG', {})
+configure_logging(TRACE_CONFIG.get('log_level', 'INFO'))
+LOG_TRACES = TRACE_CONFIG.get('log_traces', True)
+PROFILE_DIR = None  # 保存cProfile结果的目录，None表示不做性能分析
+if TRACE_CONFIG.get('profile_dir'):
+    PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), TRACE_CONFIG['profile_dir'])
+PROFILE_SAMPLE_RATE = TRACE_CONFIG.get('profile_sample_rate', 0.01)  # 被采样做性能分析的生成任务比例
+
+# 页面外壳（渲染一次后缓存，含各编码的压缩结果）
+page_shell = None
+shell_lock = threading.Lock()
+
+# 最近发出的数独的解：题目 -> 解
+recent_solutions = OrderedDict()
+solution_lock = threading.Lock()
+
+# 后台任务（预热、快照）是否已启动
+background_started = False
+background_lock = threading.Lock()
 
 # 后台生成队列
 generation_queue = Queue()
 
+# 常驻生成进程池（首次使用时创建，避免在导入时启动子进程）；
+# GENERATOR_CONFIG['executor'] 为 'thread' 时改用本进程内的工作线程
+generator_pool = None
+generator_pool_lock = threading.Lock()
+
+def get_generator_pool():
+    """获取常驻生成进程池，首次调用时启动"""
+    global generator_pool
+    with generator_pool_lock:
+        if generator_pool is None and GENERATOR_CONFIG.get('executor', 'process') == 'thread':
+            generator_pool = ThreadGeneratorPool(
+                workers=GENERATOR_CONFIG.get('workers', 2),
+                job_timeout=GENERATOR_CONFIG.get('job_timeout', 30)
+            ).start()
+            atexit.register(generator_pool.shutdown)
+        elif generator_pool is None:
+            generator_pool = GeneratorPool(
+                workers=GENERATOR_CONFIG.get('workers', 2),
+                job_timeout=GENERATOR_CONFIG.get('job_timeout', 30),
+                max_jobs_per_worker=GENERATOR_CONFIG.get('max_jobs_per_worker', 50),
+                cancel_grace=GENERATOR_CONFIG.get('cancel_grace', 5)
+            ).start()
+            atexit.register(generator_pool.shutdown)
+        return generator_pool
+
 def format_sudoku(grid, box_size):
     """格式化输出数独"""
     n = len(grid)
@@ -57,140 +173,524 @@ def format_sudoku(grid, box_size):
     result.append("+" + ("-" * (box_size * 2 + 1) + "+") * box_size)
     return "\n".join(result)
 
+def derive_from_seed(seed, count):
+    """从种子派生数独，对称变换不改变难度和指纹，派生数独沿用种子的难度和指纹"""
+    return [{'puzzle': puzzle, 'solution': solution, 'difficulty': seed.get('difficulty'),
+             'fingerprint': seed.get('fingerprint')}
+            for puzzle, solution in derive_puzzles(seed['puzzle'], seed['solution'], count)]
+
+def top_up_from_seed(size):
+    """用种子数独做对称变换，立即补满缓存，返回补充的数量"""
+    cache = puzzle_caches[size]
+    
+    def derive(missing):
+        seeds = cache.seeds()
+        if not seeds:
+            return []
+        # 优先选择缓存中还没有的那一类种子，都已在缓存中时才派生重复的一类
+        present = cache.fingerprints()
+        fresh = [seed for seed in seeds if seed.get('fingerprint') not in present]
+        return derive_from_seed(random.choice(fresh or seeds), missing)
+    
+    return cache.fill(derive)
+
+def top_up_from_bank(size):
+    """从持久化题库领取数独补满缓存，返回补充的数量"""
+    if puzzle_bank is None:
+        return 0
+    cache = puzzle_caches[size]
+    missing = cache.missing()
+    if not missing:
+        return 0
+    # 在缓存的锁之外领取：题库的写锁可能要等待其他进程，不能让这个阶数的取数独和指标抓取一起等待；
+    # 并发补充时可能多领取，放不进缓存的数独放回题库
+    claimed = puzzle_bank.claim(size, missing)
+    added = cache.extend(claimed)
+    return_to_bank(size, claimed[added:])
+    return added
+
+def top_up_cache(size):
+    """立即补满缓存：优先从题库领取，不足时再用种子派生"""
+    return top_up_from_bank(size) + top_up_from_seed(size)
+
+def fill_bank_from_seed(size, seed):
+    """
+    把新种子按配置派生的副本写入题库，题库中已有这一类数独时跳过
+    种子本身已经放入内存缓存，不再写入题库，否则同一道题目会先后从缓存和题库各发出一次
+    """
+    if puzzle_bank is None or puzzle_bank.count(size) >= BANK_TARGET_SIZE:
+        return 0
+    items = derive_puzzles(seed['puzzle'], seed['solution'], BANK_COPIES_PER_CLASS)
+    added = puzzle_bank.add_many(size, items, difficulty=seed.get('difficulty'),
+                                 fingerprint=seed['fingerprint'], max_copies=BANK_COPIES_PER_CLASS)
+    if not added:
+        metrics.DUPLICATES.inc(size=size, source='generated')
+    return added
+
+def generation_budget(size):
+    """
+    某个阶数的 (时间预算, 进程池超时)
+    没有单独配置预算的阶数在进程池超时之前留出余量，到时返回线索较多的题目，而不是被强制结束、丢掉全部结果
+    """
+    job_timeout = GENERATOR_CONFIG.get('job_timeout', 30)
+    time_budget = GENERATOR_CONFIG.get('time_budgets', {}).get(size)
+    if time_budget is None:
+        return job_timeout * 0.8, job_timeout
+    # 大数独按时间预算生成，进程池的超时在预算之上留出余量
+    return time_budget, time_budget + job_timeout
+
+def log_generation(size, outcome, started, message, level=logging.INFO, trace=None, **fields):
+    """记录一次后台生成的结果，按配置附带追踪记录（各阶段耗时、重试次数、求解器统计）"""
+    if LOG_TRACES and trace is not None:
+        fields['trace'] = trace
+    log_event('generation', message, level, size=size, outcome=outcome,
+              seconds=round(time.time() - started, 3), **fields)
+
 def generate_sudoku_background(size):
-    """后台生成数独"""
+    """
+    后台生成数独
+    :return: 生成结果，'complete'（达到目标线索数）、'partial'（超时后返回线索较多的题目）、
+             'rejected'（超时且线索过多，已放弃）、'timeout'（进程池超时）或 'error'
+    """
+    cache = puzzle_caches[size]
+    cache.generation_started()
+    metrics.GENERATION_IN_FLIGHT.inc(size=size)
+    started = time.time()
+    time_budget, timeout = generation_budget(size)
+    outcome = 'error'
+    backend = GENERATOR_CONFIG.get('backends', {}).get(size)
+    options = {
+        'mode': GENERATOR_CONFIG.get('mode', 'dig'),
+        'target_clues': GENERATOR_CONFIG.get('target_clues', {}).get(size),
+        'timeout': timeout,
+        'time_budget': time_budget,
+        'check_timeout': GENERATOR_CONFIG.get('check_timeouts', {}).get(size),
+        'max_clues': GENERATOR_CONFIG.get('max_clues', {}).get(size),
+        # 按比例采样的任务在工作进程中做cProfile性能分析
+        'profile_dir': PROFILE_DIR if PROFILE_DIR and random.random() < PROFILE_SAMPLE_RATE else None
+    }
+    racers = GENERATOR_CONFIG.get('portfolio', {}).get(size, 1)
     try:
-        result = subprocess.run(
-            ['python', 'test.py', str(size)],
-            capture_output=True,
-            text=True,
-            timeout=30  # 30秒超时
-        )
+        if racers > 1:
+            # 组合求解：多个工作进程以不同的随机种子（和求解后端）同时生成，采用最先完成的结果
+            backends = GENERATOR_CONFIG.get('portfolio_backends', {}).get(size) or [backend]
+            data = get_generator_pool().race(size, racers, backends=backends, **options)
+            metrics.PORTFOLIO_WINS.inc(size=size, backend=data.get('backend') or 'default')
+        else:
+            data = get_generator_pool().generate(size, backend=backend, **options)
+        outcome = data.get('outcome', 'complete')
+        metrics.GENERATION_SECONDS.observe(time.time() - started, size=size)
+        seed = {
+            'puzzle': data['puzzle'],
+            'solution': data['solution'],
+            'difficulty': data.get('difficulty'),
+            'fingerprint': data['fingerprint']
+        }
         
-        if result.returncode == 0:
-            data = json.loads(result.stdout)
-            if isinstance(data, dict) and 'puzzle' in data and 'solution' in data:
-                # 添加到缓存
-                with threading.Lock():
-                    if len(sudoku_cache[size]) < CACHE_SIZE:
-                        sudoku_cache[size].append({
-                            'puzzle': data['puzzle'],
-                            'solution': data['solution']
-                        })
-                        cache_status[size]['last_generation_time'] = time.time()
-                        print(f"成功生成 {size} 阶数独，当前缓存数量: {len(sudoku_cache[size])}")
+        # 添加到缓存（缓存中已有同一类数独时不重复添加），并用新种子派生数独补满缓存
+        cache.add_seed(seed)
+        cache.add_unique(seed)
+        top_up_from_seed(size)
+        fill_bank_from_seed(size, seed)
+        if outcome == 'partial':
+            message = f"生成 {size} 阶数独超过时间预算，保留了 {data.get('clues')} 个线索"
         else:
-            print(f"生成 {size} 阶数独失败: {result.stderr}")
+            message = f"成功生成 {size} 阶数独，当前缓存数量: {len(cache)}"
+        log_generation(size, outcome, started, message, trace=data.get('trace'), clues=data.get('clues'),
+                       backend=data.get('backend'), racers=data.get('racers'), cache=len(cache))
+        return outcome
             
-    except subprocess.TimeoutExpired:
-        print(f"生成 {size} 阶数独超时")
+    except GenerationTimeout:
+        outcome = 'timeout'
+        metrics.GENERATION_FAILURES.inc(size=size, reason='timeout')
+        log_generation(size, outcome, started, f"生成 {size} 阶数独超时", logging.WARNING)
+    except GenerationOverBudget as e:
+        outcome = 'rejected'
+        metrics.GENERATION_FAILURES.inc(size=size, reason='rejected')
+        log_generation(size, outcome, started, f"生成 {size} 阶数独超过时间预算: {str(e)}", logging.WARNING,
+                       e.trace)
+    except GenerationError as e:
+        metrics.GENERATION_FAILURES.inc(size=size, reason='error')
+        log_generation(size, outcome, started, f"生成 {size} 阶数独失败: {str(e)}", logging.ERROR, e.trace)
     except Exception as e:
-        print(f"生成 {size} 阶数独时发生错误: {str(e)}")
+        metrics.GENERATION_FAILURES.inc(size=size, reason='error')
+        log_generation(size, outcome, started, f"生成 {size} 阶数独时发生错误: {str(e)}", logging.ERROR)
     finally:
-        cache_status[size]['generating'] = False
+        metrics.GENERATION_IN_FLIGHT.dec(size=size)
+        metrics.GENERATION_OUTCOMES.inc(size=size, outcome=outcome)
+        try:
+            if outcome not in SUCCESS_OUTCOMES:
+                # 生成失败时改用题库或种子派生的库存补充缓存
+                top_up_cache(size)
+        finally:
+            # 唤醒等待这个阶数的请求
+            cache.generation_finished(outcome in SUCCESS_OUTCOMES)
+    return outcome
+
+def return_to_bank(size, entries):
+    """把放不进缓存的数独放回题库（按难度分批写入），返回写入的数量"""
+    if puzzle_bank is None or not entries:
+        return 0
+    groups = {}
+    for entry in entries:
+        groups.setdefault(entry.get('difficulty'), []).append(entry)
+    added = 0
+    for difficulty, group in groups.items():
+        added += puzzle_bank.add_many(size, [(entry['puzzle'], entry['solution']) for entry in group],
+                                      difficulty=difficulty,
+                                      fingerprint=[entry.get('fingerprint') or fingerprint(entry['puzzle'])
+                                                   for entry in group],
+                                      max_copies=BANK_COPIES_PER_CLASS)
+    return added
+
+def load_cache_snapshot():
+    """
+    加载缓存快照，返回放入缓存的数独数量
+    每个工作进程保存自己的快照文件，启动时认领所有已退出进程留下的快照并合并，放不进缓存的数独放回题库
+    """
+    if not SNAPSHOT_PATH:
+        return 0
+    count = 0
+    for path in snapshot_files(SNAPSHOT_PATH):
+        try:
+            loaded = load_snapshot(path)
+        except Exception as e:
+            log_event('snapshot', f"加载缓存快照失败: {str(e)}", logging.ERROR, path=path)
+            continue
+        if loaded is None:
+            continue
+        cache, seeds = loaded
+        for size in SUPPORTED_SIZES:
+            entries = cache.get(size, [])
+            puzzle_caches[size].extend_seeds(seeds.get(size, []))
+            added = puzzle_caches[size].extend(entries)
+            return_to_bank(size, entries[added:])
+            count += added
+    if count:
+        log_event('snapshot', f"已从快照加载 {count} 个数独", loaded=count)
+    return count
+
+def save_cache_snapshot():
+    """保存本进程的缓存快照（文件名带进程号，多个工作进程不会互相覆盖），返回保存的数独数量"""
+    if not SNAPSHOT_PATH:
+        return 0
+    path = worker_path(SNAPSHOT_PATH)
+    try:
+        return save_snapshot(path,
+                             {size: puzzle_caches[size].entries() for size in SUPPORTED_SIZES},
+                             {size: puzzle_caches[size].seeds() for size in SUPPORTED_SIZES})
+    except Exception as e:
+        log_event('snapshot', f"保存缓存快照失败: {str(e)}", logging.ERROR, path=path)
+        return 0
+
+def snapshot_loop():
+    """定期保存缓存快照，进程被强制结束时也只丢失最近一段时间的变化"""
+    while True:
+        time.sleep(SNAPSHOT_INTERVAL)
+        save_cache_snapshot()
+
+def warm_size(size):
+    """
+    预热一个阶数：先从题库或种子立即补满缓存，不足时交给调度器生成，等到缓存补满或超时
+    生成同样经过调度器，受 max_concurrent 限制并按优先级排队，大阶数不会在预热时占满工作进程
+    """
+    cache = puzzle_caches[size]
+    cache.initializing = True
+    top_up_cache(size)
+    deadline = time.time() + WARMUP_TIMEOUT
+    if cache.missing():
+        refill_scheduler.notify(size)
+    while cache.missing() and time.time() < deadline:
+        cache.wait_change(min(1, deadline - time.time()))
+    cache.initializing = False
+    cache.initialized = True
+    log_event('warmup', f"{size} 阶数独缓存初始化完成，当前数量: {len(cache)}", size=size, cache=len(cache))
+    # 之后由调度器按水位线继续补充
+    refill_scheduler.notify(size)
 
 def initialize_cache():
-    """初始化缓存 - 预填充所有支持的阶数"""
-    print("开始初始化数独缓存...")
+    """初始化缓存 - 所有支持的阶数并行预热"""
+    log_event('warmup', "开始初始化数独缓存...")
     
-    for size in SUPPORTED_SIZES:
-        cache_status[size]['initializing'] = True
-        print(f"预填充 {size} 阶数独缓存...")
-        
-        # 为每个阶数启动多个生成线程
-        threads = []
-        for _ in range(CACHE_SIZE):
-            thread = threading.Thread(target=generate_sudoku_background, args=(size,))
-            thread.daemon = True
-            thread.start()
-            threads.append(thread)
-        
-        # 等待所有线程完成
-        for thread in threads:
-            thread.join(timeout=60)  # 最多等待60秒
-        
-        cache_status[size]['initializing'] = False
-        cache_status[size]['initialized'] = True
-        print(f"{size} 阶数独缓存初始化完成，当前数量: {len(sudoku_cache[size])}")
+    # 各阶数同时等待，生成由调度器按优先级排队，小阶数先领到生成进程，很快就能提供数独
+    threads = []
+    for size in sorted(SUPPORTED_SIZES):
+        thread = threading.Thread(target=warm_size, args=(size,))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    
+    for thread in threads:
+        thread.join()
     
-    print("所有数独缓存初始化完成")
+    log_event('warmup', "所有数独缓存初始化完成")
+
+def inventory_depth(size):
+    """某个阶数当前可用的数独数量（内存缓存 + 持久化题库）"""
+    depth = len(puzzle_caches[size])
+    if puzzle_bank is not None:
+        depth += puzzle_bank.count(size)
+    return depth
+
+def build_watermarks():
+    """读取各阶数的高低水位线，高水位不超过缓存和题库的总容量"""
+    capacity = CACHE_SIZE + (BANK_TARGET_SIZE if puzzle_bank is not None else 0)
+    default_low = SCHEDULER_CONFIG.get('low_watermark', 1)
+    default_high = SCHEDULER_CONFIG.get('high_watermark', capacity)
+    watermarks = {}
+    for size in SUPPORTED_SIZES:
+        low, high = SCHEDULER_CONFIG.get('watermarks', {}).get(size, (default_low, default_high))
+        high = min(high, capacity)
+        watermarks[size] = (min(low, high - 1), high)
+    return watermarks
+
+# 补充调度器：根据请求速率、生成耗时和水位线决定补充哪个阶数
+SCHEDULER_CONFIG = getattr(config, 'SCHEDULER_CONFIG', {})
+refill_scheduler = RefillScheduler(
+    SUPPORTED_SIZES,
+    run_job=generate_sudoku_background,
+    depth_of=inventory_depth,
+    watermarks=build_watermarks(),
+    max_concurrent=SCHEDULER_CONFIG.get('max_concurrent', 2),
+    queue=generation_queue,
+    rate_window=SCHEDULER_CONFIG.get('rate_window', 60)
+)
+
+# 缓存和题库深度在抓取指标时计算
+metrics.CACHE_DEPTH.set_function(lambda: {(size,): len(puzzle_caches[size]) for size in SUPPORTED_SIZES})
+
+def bank_depth():
+    """各阶数的题库库存，题库取空的阶数报告0，而不是不出现"""
+    counts = puzzle_bank.counts()
+    return {(size,): counts.get(size, 0) for size in SUPPORTED_SIZES}
+
+if puzzle_bank is not None:
+    metrics.BANK_DEPTH.set_function(bank_depth)
+
+def take_puzzles(size, limit, difficulty=None):
+    """
+    一次取出最多limit个数独：先从内存缓存取，不足时从题库批量领取，
+    再不足时用同难度的种子数独派生
+    :param difficulty: 只取该难度的数独，None表示不限
+    :return: [{'puzzle': 题目, 'solution': 解, 'difficulty': 难度}, ...]
+    """
+    taken = puzzle_caches[size].take(limit, difficulty)
+    if len(taken) < limit and puzzle_bank is not None:
+        taken.extend(puzzle_bank.claim(size, limit - len(taken), difficulty))
+    if len(taken) < limit:
+        seeds = [seed for seed in puzzle_caches[size].seeds()
+                 if difficulty is None or seed.get('difficulty') == difficulty]
+        if seeds:
+            taken.extend(derive_from_seed(random.choice(seeds), limit - len(taken)))
+    check_and_generate_background(size)
+    return taken
 
 def check_and_generate_background(size):
-    """检查缓存数量，如果不足则后台生成"""
-    with threading.Lock():
-        if (len(sudoku_cache[size]) <= 1 and 
-            not cache_status[size]['generating'] and
-            time.time() - cache_status[size]['last_generation_time'] > 5):  # 避免频繁生成
-            
-            cache_status[size]['generating'] = True
-            thread = threading.Thread(target=generate_sudoku_background, args=(size,))
-            thread.daemon = True
-            thread.start()
-            print(f"启动后台生成 {size} 阶数独")
+    """立即补满缓存，并通知调度器检查是否需要后台生成"""
+    # 生成新种子需要时间，先从题库或已有种子立即补满缓存
+    top_up_cache(size)
+    refill_scheduler.notify(size)
+
+@app.context_processor
+def inject_supported_sizes():
+    """模板中显示支持的阶数"""
+    return {'supported_sizes': SUPPORTED_SIZES}
+
+def request_puzzle(n, difficulty=None):
+    """
+    为页面取出一个数独（POST / 和 /api/puzzle 共用）
+    :return: (数独条目, 错误信息)，没有可用的数独时条目为None
+    """
+    n = int(n)
+    if difficulty is not None and difficulty not in DIFFICULTIES:
+        raise ValueError(f"未知的难度: {difficulty}")
+    
+    # 验证是否为支持的阶数
+    if n not in SUPPORTED_SIZES:
+        # 验证是否为完全平方数
+        sqrt_n = int(n ** 0.5)
+        if sqrt_n * sqrt_n != n:
+            raise ValueError("n必须是完全平方数")
+        return None, f"暂不支持 {n} 阶数独，目前仅支持 {', '.join(map(str, SUPPORTED_SIZES))} 阶"
+    
+    refill_scheduler.record_request(n)
+    
+    # 从缓存、题库或种子数独中取出一个（指定难度的）数独
+    taken = take_puzzles(n, 1, difficulty)
+    if not taken and PUZZLE_WAIT_TIMEOUT > 0:
+        # 没有库存时短暂等待正在进行（或刚刚触发）的生成，新数独一放入缓存就返回
+        entry = puzzle_caches[n].wait_take(difficulty, PUZZLE_WAIT_TIMEOUT)
+        # 新数独可能已被其他等待的请求取走，但生成结束后可以从新种子派生
+        taken = [entry] if entry is not None else take_puzzles(n, 1, difficulty)
+        if taken:
+            metrics.PUZZLE_REQUESTS.inc(size=n, result='waited')
+            remember_solution(taken[0])
+            return taken[0], None
+    if not taken and puzzle_caches[n].initializing:
+        metrics.PUZZLE_REQUESTS.inc(size=n, result='initializing')
+        return None, f"{n}阶数独初始化中，请稍后再试"
+    if not taken:
+        # 通知调度器启动后台生成
+        metrics.PUZZLE_REQUESTS.inc(size=n, result='generating')
+        refill_scheduler.notify(n)
+        return None, f"{n}阶数独生成中，请稍后再试"
+    metrics.PUZZLE_REQUESTS.inc(size=n, result='hit')
+    remember_solution(taken[0])
+    return taken[0], None
+
+def puzzle_payload(entry):
+    """页面使用的数独数据：只有规范字符串形式的题目，解在需要时通过 /api/solution 获取"""
+    return {
+        'n': entry['puzzle'].n,
+        'puzzle': entry['puzzle'].to_string(),
+        'difficulty': entry.get('difficulty'),
+        'difficulty_name': DIFFICULTY_NAMES.get(entry.get('difficulty'))
+    }
+
+def remember_solution(entry):
+    """记住最近发出的数独的解，客户端请求答案时不需要重新求解"""
+    with solution_lock:
+        recent_solutions[entry['puzzle']] = entry['solution']
+        recent_solutions.move_to_end(entry['puzzle'])
+        while len(recent_solutions) > RECENT_SOLUTIONS_SIZE:
+            recent_solutions.popitem(last=False)
+
+def lookup_solution(puzzle):
+    """
+    查找题目的解：先查最近发出的数独，找不到时（例如由其他工作进程发出）再用求解后端求解，
+    求解与唯一解验证一样限制阶数和时间
+    :return: (解（Puzzle）, 错误信息)，找不到解时解为None
+    """
+    with solution_lock:
+        solution = recent_solutions.get(puzzle)
+    if solution is not None:
+        return solution, None
+    if puzzle.n > REFRESH_VERIFY_MAX_SIZE:
+        return None, '无法验证该数独'
+    engine = get_backend(GENERATOR_CONFIG.get('backends', {}).get(puzzle.n))
+    try:
+        solution = engine.solve(puzzle.to_grid(), deadline=time.perf_counter() + REFRESH_VERIFY_TIMEOUT)
+    except SearchTimeout:
+        return None, '无法在限定时间内验证该数独'
+    if solution is None:
+        return None, '题目无解'
+    return Puzzle.from_grid(solution), None
+
+def puzzle_events_url(n, difficulty=None):
+    """订阅某个阶数新数独的事件流地址，不支持的阶数返回None"""
+    if int(n) not in SUPPORTED_SIZES:
+        return None
+    return url_for('events', n=int(n), difficulty=difficulty)
+
+def render_shell():
+    """
+    渲染页面外壳（不含数独，只与配置有关），每个进程只渲染一次，
+    按编码缓存压缩结果，ETag取内容的哈希
+    """
+    global page_shell
+    with shell_lock:
+        if page_shell is None:
+            body = render_template('index.html', config=config).encode('utf-8')
+            page_shell = {None: body, 'etag': hashlib.sha1(body).hexdigest()}
+        return page_shell
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
-        n = request.form.get('n', '')
+        # 不使用脚本提交表单时的兼容路径：把数独数据嵌入页面，由页面脚本渲染
         try:
-            n = int(n)
-            
-            # 验证是否为支持的阶数
-            if n not in SUPPORTED_SIZES:
-                # 验证是否为完全平方数
-                sqrt_n = int(n ** 0.5)
-                if sqrt_n * sqrt_n != n:
-                    raise ValueError("n必须是完全平方数")
-                else:
-                    return render_template('index.html', error=f"暂不支持 {n} 阶数独，目前仅支持 {', '.join(map(str, SUPPORTED_SIZES))} 阶", config=config)
-            
-            # 检查缓存状态
-            if cache_status[n]['initializing']:
-                return render_template('index.html', error=f"{n}阶数独初始化中，请稍后再试", config=config)
-            
-            # 从缓存中获取数独（线程安全）
-            with threading.Lock():
-                # 检查缓存是否为空
-                if len(sudoku_cache[n]) == 0:
-                    if not cache_status[n]['generating']:
-                        # 启动后台生成
-                        cache_status[n]['generating'] = True
-                        thread = threading.Thread(target=generate_sudoku_background, args=(n,))
-                        thread.daemon = True
-                        thread.start()
-                    return render_template('index.html', error=f"{n}阶数独生成中，请稍后再试", config=config)
-                
-                # 安全地从缓存中获取数据 - 使用try-except防止竞态条件
-                try:
-                    cached_data = sudoku_cache[n].popleft()
-                    
-                    # 检查是否需要后台生成
-                    check_and_generate_background(n)
-                    
-                    # 将数字转换为字符串以便模板处理
-                    puzzle = [[str(cell) for cell in row] for row in cached_data['puzzle']]
-                    solution = [[str(cell) for cell in row] for row in cached_data['solution']]
-                    
-                    return render_template('index.html',
-                                        n=n,
-                                        puzzle=puzzle,
-                                        solution=solution,
-                                        config=config)
-                except IndexError:
-                    # 如果缓存为空（竞态条件发生），返回错误信息
-                    if not cache_status[n]['generating']:
-                        cache_status[n]['generating'] = True
-                        thread = threading.Thread(target=generate_sudoku_background, args=(n,))
-                        thread.daemon = True
-                        thread.start()
-                    return render_template('index.html', error=f"{n}阶数独生成中，请稍后再试", config=config)
+            difficulty = request.form.get('difficulty') or None
+            entry, error = request_puzzle(request.form.get('n', ''), difficulty)
+            if entry is None:
+                # 生成中时页面脚本订阅事件流，新数独生成后直接显示，不需要反复提交表单
+                return render_template('index.html', error=error, config=config,
+                                       subscribe=puzzle_events_url(request.form.get('n'), difficulty))
+            return render_template('index.html', initial=puzzle_payload(entry), config=config)
             
         except ValueError as e:
             return render_template('index.html', error=str(e), config=config)
         except Exception as e:
             return render_template('index.html', error=f"发生错误: {str(e)}", config=config)
     
-    return render_template('index.html', config=config)
+    # 页面外壳可以被浏览器和CDN缓存，内容不变时返回304
+    shell = render_shell()
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    etag = shell['etag']
+    if encoding is not None:
+        with shell_lock:
+            if encoding not in shell:
+                shell[encoding] = compress(shell[None], encoding, WEB_CONFIG.get('compress_level', 6))
+        etag = f'{etag}-{encoding}'
+    response = Response(shell[encoding], mimetype='text/html')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"public, max-age={WEB_CONFIG.get('shell_max_age', 60)}"
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
+@app.route('/api/puzzle', methods=['POST'])
+def api_puzzle():
+    """页面获取一个数独（JSON），参数: n - 数独阶数, difficulty - 难度（可选）"""
+    data = request.get_json(silent=True) or request.values
+    try:
+        entry, error = request_puzzle(data.get('n', ''), data.get('difficulty') or None)
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+    if entry is None:
+        events = puzzle_events_url(data.get('n'), data.get('difficulty') or None)
+        if events is None:
+            return {'success': False, 'error': error}
+        # 客户端订阅事件流等待新数独，不需要反复请求
+        return {'success': False, 'error': error, 'pending': True, 'events': events}
+    return dict(puzzle_payload(entry), success=True)
+
+@app.route('/api/solution', methods=['POST'])
+def api_solution():
+    """按需获取题目的解，参数: n, puzzle（规范字符串）"""
+    data = request.get_json(silent=True) or {}
+    try:
+        n = int(data.get('n', ''))
+        if n not in SUPPORTED_SIZES:
+            return {'success': False, 'error': f'不支持的阶数: {n}'}
+        puzzle = Puzzle.parse(data.get('puzzle'), n)
+    except ValueError as e:
+        return {'success': False, 'error': f'数独格式不正确: {str(e)}'}
+    solution, error = lookup_solution(puzzle)
+    if solution is None:
+        return {'success': False, 'error': error}
+    return {'success': True, 'solution': solution.to_string()}
+
+@app.after_request
+def compress_body(response):
+    """按 Accept-Encoding 压缩JSON和HTML响应（流式响应不压缩）"""
+    return compress_response(response, request.headers.get('Accept-Encoding'),
+                             min_size=WEB_CONFIG.get('compress_min_size', 512),
+                             level=WEB_CONFIG.get('compress_level', 6))
+
+def check_submission(n, puzzle, solution, puzzle_print):
+    """
+    检查客户端提交的数独是否有效
+    由本服务生成过的数独（指纹在题库或种子中）只需核对解，其他数独还要验证唯一解
+    :return: 错误信息，有效时返回None
+    """
+    if not solution.is_solved():
+        return '解不满足数独规则'
+    if not puzzle.agrees_with(solution):
+        return '题目与解不一致'
+    if any(seed.get('fingerprint') == puzzle_print for seed in puzzle_caches[n].seeds()):
+        return None
+    if puzzle_bank is not None and puzzle_bank.is_known(n, puzzle_print):
+        return None
+    if n > REFRESH_VERIFY_MAX_SIZE:
+        return '无法验证该数独'
+    engine = get_backend(GENERATOR_CONFIG.get('backends', {}).get(n))
+    try:
+        if engine.count_solutions(puzzle.to_grid(), deadline=time.perf_counter() + REFRESH_VERIFY_TIMEOUT) != 1:
+            return '题目不是唯一解'
+    except SearchTimeout:
+        return '无法在限定时间内验证该数独'
+    return None
 
 @app.route('/refresh', methods=['POST'])
 def refresh_sudoku():
@@ -201,7 +701,7 @@ def refresh_sudoku():
         puzzle = data.get('puzzle')
         solution = data.get('solution')
         
-        if not n or not puzzle or not solution:
+        if not n or not puzzle:
             return {'success': False, 'error': '缺少必要参数'}
         
         n = int(n)
@@ -210,23 +710,38 @@ def refresh_sudoku():
         if n not in SUPPORTED_SIZES:
             return {'success': False, 'error': f'不支持的阶数: {n}'}
         
-        # 将数独重新放回缓存（线程安全）
-        with threading.Lock():
-            # 将字符串转换回数字
-            puzzle_numeric = [[int(cell) for cell in row] for row in puzzle]
-            solution_numeric = [[int(cell) for cell in row] for row in solution]
-            
-            # 如果缓存已满，移除最旧的一个
-            if len(sudoku_cache[n]) >= CACHE_SIZE:
-                sudoku_cache[n].popleft()
-            
-            # 将当前数独添加到缓存
-            sudoku_cache[n].append({
-                'puzzle': puzzle_numeric,
-                'solution': solution_numeric
-            })
-            
-            print(f"数独已重新放回 {n} 阶缓存，当前缓存数量: {len(sudoku_cache[n])}")
+        # 规范字符串（旧版页面发送的嵌套列表也兼容）；页面没有取过解时不发送解，由服务端查找
+        try:
+            puzzle = Puzzle.parse(puzzle, n)
+            if solution:
+                solution, error = Puzzle.parse(solution, n), None
+            else:
+                solution, error = lookup_solution(puzzle)
+        except ValueError as e:
+            return {'success': False, 'error': f'数独格式不正确: {str(e)}'}
+        if solution is None:
+            return {'success': False, 'error': error}
+        
+        puzzle_print = fingerprint(puzzle)
+        error = check_submission(n, puzzle, solution, puzzle_print)
+        if error:
+            return {'success': False, 'error': error}
+        
+        # 库存中已有同一类数独（包括对称变换得到的副本）时不重复放回
+        if puzzle_print in puzzle_caches[n].fingerprints() or (
+                puzzle_bank is not None and puzzle_bank.contains(n, puzzle_print)):
+            metrics.DUPLICATES.inc(size=n, source='refresh')
+            return {'success': True, 'duplicate': True}
+        
+        # 将数独重新放回缓存，缓存已满时移除最旧的一个
+        cache = puzzle_caches[n]
+        cache.add({
+            'puzzle': puzzle,
+            'solution': solution,
+            'difficulty': rate_puzzle(puzzle.to_grid())['difficulty'],
+            'fingerprint': puzzle_print
+        }, evict=True)
+        log_event('refresh', f"数独已重新放回 {n} 阶缓存，当前缓存数量: {len(cache)}", size=n, cache=len(cache))
         
         return {'success': True}
         
@@ -235,12 +750,8 @@ def refresh_sudoku():
 
 @app.route('/hint', methods=['POST'])
 def get_hint():
-    """获取AI提示"""
+    """获取提示：优先使用本地提示引擎，需要文字解说或本地找不到时再调用AI"""
     try:
-        # 检查AI功能是否启用
-        if not config.AI_CONFIG['enabled']:
-            return {'success': False, 'error': 'AI提示功能未启用'}
-        
         data = request.get_json()
         n = data.get('n')
         current_state = data.get('current_state')
@@ -248,6 +759,24 @@ def get_hint():
         if not n or not current_state:
             return {'success': False, 'error': '缺少必要参数'}
         
+        # 本地提示引擎：直接给出下一步可以确定的格子
+        if config.AI_CONFIG.get('local_hints', True) and not config.AI_CONFIG.get('prose', False):
+            local = find_hint(int(n), current_state)
+            if local is not None:
+                metrics.HINT_REQUESTS.inc(source='local')
+                return {
+                    'success': True,
+                    'source': 'local',
+                    'hint': describe(local),
+                    'cell': local['cell'],
+                    'value': local['value'],
+                    'technique': local['technique']
+                }
+        
+        # 检查AI功能是否启用
+        if not config.AI_CONFIG['enabled']:
+            return {'success': False, 'error': 'AI提示功能未启用'}
+        
         # 检查API密钥
         api_key = config.AI_CONFIG['api_key']
         if not api_key:
@@ -259,45 +788,207 @@ def get_hint():
             current_state=current_state
         )
         
-        # 调用AI API
-        import requests
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        }
-        
-        payload = {
-            'model': config.AI_CONFIG['model'],
-            'messages': [
-                {'role': 'user', 'content': prompt}
-            ],
-            'max_tokens': config.AI_CONFIG['max_tokens'],
-            'temperature': 0.7
-        }
-        
-        response = requests.post(config.AI_CONFIG['api_url'], 
-                            headers=headers, 
-                            json=payload,
-                            timeout=30)
-        
-        if response.status_code == 200:
-            result = response.json()
-            hint = result['choices'][0]['message']['content']
-            return {'success': True, 'hint': hint}
-        else:
-            return {'success': False, 'error': f'AI API调用失败: {response.status_code}'}
+        metrics.HINT_REQUESTS.inc(source='ai')
+        # 通过共享的提示客户端调用AI API，相同盘面的请求会合并，结果会被缓存
+        ticket, future = get_hint_client().submit(n, current_state, prompt)
+        try:
+            return future.result(timeout=config.AI_CONFIG.get('wait_timeout', 5))
+        except FutureTimeout:
+            # 不长时间占用工作线程，客户端订阅事件流（或凭票据查询）取得结果
+            return {'success': True, 'pending': True, 'ticket': ticket,
+                    'events': url_for('events', ticket=ticket)}
             
     except Exception as e:
         return {'success': False, 'error': f'获取提示失败: {str(e)}'}
 
+@app.route('/hint/<ticket>', methods=['GET'])
+def get_hint_result(ticket):
+    """查询尚未完成的AI提示"""
+    result = get_hint_client().lookup(ticket)
+    if result is None:
+        return {'success': False, 'error': '提示不存在或已过期，请重新获取'}
+    if result.get('pending'):
+        return {'success': True, 'pending': True, 'ticket': ticket,
+                'events': url_for('events', ticket=ticket)}
+    return result
+
+def server_event(event, data):
+    """格式化一条Server-Sent Events事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/events', methods=['GET'])
+def events():
+    """
+    推送事件流（Server-Sent Events），结果就绪时立即推送，不需要客户端反复请求
+    参数: n - 订阅该阶数的新数独（difficulty - 难度，可选）, ticket - 订阅该票据的AI提示，两者可以同时订阅
+    事件: puzzle - 数独数据（与 /api/puzzle 相同）, hint - 提示结果（与 /hint 相同）,
+          timeout - 超过 WEB_CONFIG['events_timeout'] 仍未就绪；全部推送后服务端关闭连接
+    """
+    n = request.args.get('n')
+    difficulty = request.args.get('difficulty') or None
+    ticket = request.args.get('ticket')
+    if n is None and ticket is None:
+        return {'success': False, 'error': '缺少必要参数'}
+    if n is not None:
+        try:
+            n = int(n)
+        except ValueError:
+            return {'success': False, 'error': '缺少必要参数'}
+        if n not in SUPPORTED_SIZES:
+            return {'success': False, 'error': f'不支持的阶数: {n}'}
+        if difficulty is not None and difficulty not in DIFFICULTIES:
+            return {'success': False, 'error': f'未知的难度: {difficulty}'}
+        refill_scheduler.record_request(n)
+    hint = get_hint_client().watch(ticket) if ticket is not None else None
+    
+    def push_puzzle(entry):
+        metrics.PUZZLE_REQUESTS.inc(size=n, result='pushed')
+        remember_solution(entry)
+        return server_event('puzzle', dict(puzzle_payload(entry), success=True))
+    
+    def stream():
+        yield f'retry: {EVENTS_RETRY}\n\n'
+        if ticket is not None and hint is None:
+            yield server_event('hint', {'success': False, 'error': '提示不存在或已过期，请重新获取'})
+        pending_hint = hint
+        pending_puzzle = n is not None
+        deadline = time.time() + EVENTS_TIMEOUT
+        heartbeat = time.time() + EVENTS_HEARTBEAT
+        while pending_puzzle or pending_hint is not None:
+            if pending_hint is not None and pending_hint.done():
+                try:
+                    result = pending_hint.result()
+                except Exception as e:
+                    result = {'success': False, 'error': f'获取提示失败: {str(e)}'}
+                yield server_event('hint', result)
+                pending_hint = None
+                continue
+            if pending_puzzle:
+                # 缓存、题库或种子数独中有可用的数独时立即推送，否则触发后台生成
+                taken = take_puzzles(n, 1, difficulty)
+                if taken:
+                    yield push_puzzle(taken[0])
+                    pending_puzzle = False
+                    continue
+            now = time.time()
+            if now >= deadline:
+                message = f'{n}阶数独生成中，请稍后再试' if pending_puzzle else '获取提示超时，请重试'
+                yield server_event('timeout', {'success': False, 'error': message})
+                return
+            if now >= heartbeat:
+                yield ': keepalive\n\n'
+                heartbeat = now + EVENTS_HEARTBEAT
+            remaining = min(deadline, heartbeat) - now
+            if pending_puzzle:
+                # 同时等待提示时缩短每次等待，及时发现提示完成
+                timeout = min(remaining, 0.5) if pending_hint is not None else remaining
+                entry = puzzle_caches[n].wait_take(difficulty, timeout)
+                if entry is not None:
+                    yield push_puzzle(entry)
+                    pending_puzzle = False
+            else:
+                wait_futures([pending_hint], timeout=remaining)
+    
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # 反向代理（nginx）不缓冲事件流
+    return response
+
+@app.route('/api/puzzles', methods=['GET', 'POST'])
+def batch_puzzles():
+    """
+    批量获取数独，以换行分隔的JSON（NDJSON）流式返回
+    参数: size - 数独阶数, count - 数量, difficulty - 难度（可选）,
+          solution - 是否包含解（默认包含，0/false表示只返回题目）,
+          format - 'grid' 返回 n×n 列表（默认），'string' 返回规范字符串
+    """
+    try:
+        size = int(request.values.get('size', ''))
+        count = int(request.values.get('count', 1))
+    except ValueError:
+        return {'success': False, 'error': '缺少必要参数'}
+    
+    if size not in SUPPORTED_SIZES:
+        return {'success': False, 'error': f'不支持的阶数: {size}'}
+    if not 1 <= count <= API_MAX_BATCH:
+        return {'success': False, 'error': f'count 必须在 1 到 {API_MAX_BATCH} 之间'}
+    difficulty = request.values.get('difficulty') or None
+    if difficulty is not None and difficulty not in DIFFICULTIES:
+        return {'success': False, 'error': f'未知的难度: {difficulty}'}
+    include_solution = request.values.get('solution', '1').lower() not in ('0', 'false', 'no')
+    output_format = request.values.get('format', 'grid')
+    if output_format not in ('grid', 'string'):
+        return {'success': False, 'error': f'未知的格式: {output_format}'}
+    encode = Puzzle.to_string if output_format == 'string' else Puzzle.to_grid
+    refill_scheduler.record_request(size)
+    
+    def stream():
+        delivered = 0
+        deadline = time.time() + API_WAIT_TIMEOUT
+        while delivered < count:
+            batch = take_puzzles(size, count - delivered, difficulty)
+            if not batch:
+                # 库存不足时等待调度器生成新的数独
+                if time.time() > deadline:
+                    metrics.PUZZLE_REQUESTS.inc(size=size, result='generating')
+                    yield json.dumps({'success': False, 'error': f'{size}阶数独生成中，请稍后再试',
+                                      'delivered': delivered}, ensure_ascii=False) + '\n'
+                    return
+                puzzle_caches[size].wait_change(0.5)
+                continue
+            deadline = time.time() + API_WAIT_TIMEOUT
+            metrics.PUZZLE_REQUESTS.inc(len(batch), size=size, result='hit')
+            for item in batch:
+                record = {'n': size, 'difficulty': item.get('difficulty'), 'puzzle': encode(item['puzzle'])}
+                if include_solution:
+                    record['solution'] = encode(item['solution'])
+                delivered += 1
+                yield json.dumps(record, separators=(',', ':')) + '\n'
+    
+    return Response(stream(), mimetype='application/x-ndjson')
+
+@app.route('/scheduler', methods=['GET'])
+def scheduler_state():
+    """查看补充调度器状态"""
+    return refill_scheduler.state()
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus格式的运行指标"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/ready', methods=['GET'])
+def readiness():
+    """就绪检查：READY_SIZES 中每个阶数都有可用的数独时返回200，否则返回503，供负载均衡器判断是否转发流量"""
+    inventory = {size: inventory_depth(size) for size in READY_SIZES}
+    ready = all(inventory.values())
+    return {'ready': ready, 'inventory': inventory}, 200 if ready else 503
+
 # 服务器启动时立即初始化缓存
 def start_cache_initialization():
-    """启动缓存初始化"""
-    print("服务器启动，开始预生成数独缓存...")
+    """启动缓存初始化：同步加载快照（启动后即可提供快照中的数独），再在后台预热和定期保存快照"""
+    log_event('startup', "服务器启动，开始预生成数独缓存...")
+    load_cache_snapshot()
+    if SNAPSHOT_PATH:
+        atexit.register(save_cache_snapshot)
+        if SNAPSHOT_INTERVAL:
+            threading.Thread(target=snapshot_loop, daemon=True).start()
     init_thread = threading.Thread(target=initialize_cache)
     init_thread.daemon = True
     init_thread.start()
 
+def create_app():
+    """
+    应用工厂：启动后台预热，重复调用只启动一次
+    任何WSGI服务器都可以通过它启动，例如 gunicorn "app:create_app()"
+    """
+    global background_started
+    with background_lock:
+        if not background_started:
+            background_started = True
+            start_cache_initialization()
+    return app
+
 # 在第一次请求时检查缓存状态
 @app.before_request
 def check_cache_status():
@@ -306,6 +997,8 @@ def check_cache_status():
     pass
 
 if __name__ == '__main__':
-    # 服务器启动时立即开始预生成
-    start_cache_initialization()
-    app.run(host='::', port=5000, debug=True)
+    debug = True
+    # 调试模式下重载器的父进程只负责监视文件变化，由实际处理请求的子进程启动后台任务
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        create_app()
+    app.run(host='::', port=5000, debug=debug)
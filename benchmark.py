@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+数独生成基准测试
+对每个阶数、求解后端和挖空方式，用多个随机种子调用 generate_sudoku，统计：
+- 生成完整解的耗时
+- 唯一解验证的耗时
+- 重试次数和唯一解检查次数
+- Python堆内存峰值（tracemalloc，不包含z3等C扩展内部分配的内存）
+并输出分位数，结果可保存为JSON，用 --compare 与之前的结果对比。
+
+用法: python benchmark.py --sizes 4 9 16 --backends bitmask z3 --modes dig random --seeds 50 --output bench.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from test import generate_sudoku
+
+METRICS = ['total_time', 'full_grid_time', 'unique_time', 'retries', 'checks', 'peak_memory']
+
+
+def percentile(values, q):
+    """线性插值的分位数，q取0到100"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def summarize(values):
+    return {
+        'mean': sum(values) / len(values) if values else None,
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else None
+    }
+
+
+def run_once(size, backend, mode, seed, measure_memory):
+    """用固定种子生成一次数独，返回该次的各项指标"""
+    random.seed(seed)
+    stats = {}
+    started = time.perf_counter()
+    generate_sudoku(size, backend=backend, mode=mode, stats=stats)
+    record = {
+        'seed': seed,
+        'total_time': time.perf_counter() - started,
+        'full_grid_time': stats.get('full_grid_time', 0),
+        'unique_time': stats.get('unique_time', 0),
+        'retries': stats.get('retries', 0),
+        'checks': stats.get('checks', 0)
+    }
+
+    if measure_memory:
+        # 计时和内存分开测量，避免tracemalloc的开销影响耗时
+        random.seed(seed)
+        tracemalloc.start()
+        try:
+            generate_sudoku(size, backend=backend, mode=mode)
+            record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return record
+
+
+def run_case(size, backend, mode, seeds, measure_memory, first_seed=0):
+    runs, errors = [], []
+    for seed in range(first_seed, first_seed + seeds):
+        try:
+            runs.append(run_once(size, backend, mode, seed, measure_memory))
+        except (ValueError, ImportError) as e:
+            errors.append({'seed': seed, 'error': str(e)})
+    summary = {metric: summarize([run[metric] for run in runs if metric in run]) for metric in METRICS}
+    return {
+        'size': size,
+        'backend': backend,
+        'mode': mode,
+        'seeds': seeds,
+        'failures': len(errors),
+        'summary': summary,
+        'runs': runs,
+        'errors': errors
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def case_key(case):
+    return f"{case['size']}/{case['backend']}/{case['mode']}"
+
+
+def print_table(cases, baseline=None):
+    """打印各组合的分位数（时间单位毫秒），提供基准结果时附加p50变化比例"""
+    previous = {case_key(case): case for case in (baseline or {}).get('cases', [])}
+    header = f"{'case':<22}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'grid p50':>10}{'uniq p50':>10}{'retries':>9}{'peak KB':>10}"
+    if previous:
+        header += f"{'vs base':>10}"
+    print(header)
+    for case in cases:
+        s = case['summary']
+        ms = lambda metric, q: (s[metric][q] or 0) * 1000
+        line = (f"{case_key(case):<22}{ms('total_time', 'p50'):>10.2f}{ms('total_time', 'p90'):>10.2f}"
+                f"{ms('total_time', 'p99'):>10.2f}{ms('full_grid_time', 'p50'):>10.2f}"
+                f"{ms('unique_time', 'p50'):>10.2f}{s['retries']['mean'] or 0:>9.2f}"
+                f"{(s['peak_memory']['max'] or 0) / 1024:>10.1f}")
+        old = previous.get(case_key(case))
+        if old and old['summary']['total_time']['p50']:
+            change = s['total_time']['p50'] / old['summary']['total_time']['p50'] - 1
+            line += f"{change:>+10.1%}"
+        if case['failures']:
+            line += f"  ({case['failures']} 次失败)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数独生成基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 9, 16])
+    parser.add_argument('--backends', nargs='+', default=['bitmask'])
+    parser.add_argument('--modes', nargs='+', default=['dig', 'random'])
+    parser.add_argument('--seeds', type=int, default=20, help='每个组合运行的种子数')
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='不测量内存峰值（测量时每个种子需运行两次）')
+    parser.add_argument('--output', help='保存JSON结果的路径')
+    parser.add_argument('--compare', help='之前保存的JSON结果，用于对比')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    cases = []
+    for size in args.sizes:
+        for backend in args.backends:
+            for mode in args.modes:
+                print(f"运行 {size}/{backend}/{mode} ...", file=sys.stderr)
+                cases.append(run_case(size, backend, mode, args.seeds, not args.no_memory, args.first_seed))
+
+    result = {
+        'commit': git_commit(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cases': cases
+    }
+    print_table(cases, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+响应压缩
+按客户端的 Accept-Encoding 选择 brotli（安装了 brotli 库时）或 gzip 压缩响应体。
+页面外壳这类不变的内容只压缩一次，之后直接返回缓存的压缩结果。
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 值得压缩的内容类型
+COMPRESSIBLE_TYPES = ('text/html', 'text/plain', 'application/json')
+
+
+def _accepted(accept_encoding):
+    """解析 Accept-Encoding，返回 q>0 的编码集合"""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(name)
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    """
+    选择压缩编码
+    :return: 'br'、'gzip' 或 None（不压缩）
+    """
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, level=6):
+    """
+    压缩数据
+    :param encoding: 'br' 或 'gzip'
+    :param level: gzip 压缩级别（1-9），brotli 使用对应的质量（0-11）
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(11, level + 2))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_response(response, accept_encoding, min_size=512, level=6):
+    """
+    压缩Flask响应（在 after_request 中调用）：跳过流式响应、已压缩的响应、
+    不适合压缩的类型和过小的响应体
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 304) or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    response.set_data(compress(data, encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    # 强ETag只对应一种表示，压缩后的内容需要不同的ETag
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
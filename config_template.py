@@ -50,5 +50,135 @@ AI_CONFIG = {
     'api_key': 'YOUR_API_KEY_HERE',  # 请替换为你的API密钥
     'model': 'deepseek-chat',  # 使用的模型
     'prompt_template': '请为这个数独提供一些解题提示：\n数独阶数：{n}\n当前状态：{current_state}\n请给出简洁的第一人称以建议的口吻的一句话的解题思路和下一步建议。',
-    'max_tokens': 200
-}
\ No newline at end of file
+    'max_tokens': 200,
+    'local_hints': True,  # 优先使用本地提示引擎（毫秒级，不调用AI接口），本地找不到时再调用AI
+    'prose': False,  # 为True时总是调用AI获取文字解说
+    'timeout': 30,  # 单次AI请求超时（秒）
+    'wait_timeout': 5,  # /hint 最多等待的时间（秒），超过后返回票据，客户端凭票据查询结果
+    'max_concurrent': 4,  # 同时进行的AI请求上限（共享连接池大小）
+    'cache_size': 512,  # 缓存的提示数量
+    'cache_ttl': 600  # 提示缓存有效期（秒）
+}
+
+# 数独生成进程池配置
+GENERATOR_CONFIG = {
+    'workers': 2,  # 常驻工作进程数量
+    # 'process' 在常驻子进程中生成；'thread' 在本进程的常驻线程中生成（不启动子进程，
+    # z3/sat 后端每个线程使用自己的z3上下文，求解时可以并行，bitmask 后端受GIL限制）
+    'executor': 'process',
+    'job_timeout': 30,  # 单个生成任务超时时间（秒）
+    'max_jobs_per_worker': 50,  # 每个工作进程处理多少个任务后回收重建，0表示不回收
+    # 支持的数独阶数。25、36阶的一次生成要几十秒到几分钟，会长时间占用工作进程，
+    # 加入时应相应增加 workers 和 SCHEDULER_CONFIG['max_concurrent']，下面各项中25、36阶的配置在加入后生效
+    'sizes': [4, 9, 16],
+    # 挖空方式：'dig' 逐个挖空（复用求解上下文，无需重试），'random' 随机挖空约60%后补回线索
+    'mode': 'dig',
+    # 'dig' 模式下各阶数的目标线索数量，未配置的阶数保留约40%的格子；
+    # 配置为 (最少, 最多) 时每次随机取值，使库存覆盖不同难度。
+    # 16阶低于约100个线索时唯一解检查急剧变慢：100个以上每题不到1秒，60~90个每题要5~20秒，
+    # 经常耗尽预算，调低下限时应相应增加 job_timeout、workers，并降低 SCHEDULER_CONFIG 中16阶的水位
+    'target_clues': {
+        4: (4, 8),
+        9: (17, 36),
+        16: (100, 130),
+        25: (250, 340),
+        36: (600, 760)
+    },
+    # 各阶数使用的求解后端：'bitmask'（纯Python，无需z3）、'z3' 或 'sat'（一热布尔编码，需要z3，
+    # 适合25阶及以上），未配置的阶数使用 bitmask
+    'backends': {
+        4: 'bitmask',
+        9: 'bitmask',
+        16: 'bitmask',
+        25: 'sat',
+        36: 'sat'
+    },
+    # 各阶数的生成时间预算（秒）：超过预算时停止挖空，返回线索较多但仍唯一解的题目
+    'time_budgets': {
+        25: 60,
+        36: 150
+    },
+    # 未配置时间预算的阶数使用 job_timeout 的80%作为预算，超过预算时同样返回线索较多的题目，不会被强制结束
+    # 单次唯一解检查的时间上限（秒）：超过时保留该线索，继续尝试其他格子，避免个别难证明的格子耗尽预算
+    'check_timeouts': {
+        16: 2,
+        25: 5,
+        36: 10
+    },
+    # 超过预算后题目保留的线索超过该数量时放弃这次生成，改用题库或种子派生的库存
+    'max_clues': {
+        16: 160,
+        25: 400,
+        36: 900
+    },
+    'verify_timeout': 5,  # 刷新提交的数独做唯一解验证的时间上限（秒）
+    # 组合求解：大数独的生成耗时波动很大，同一个任务交给多个工作进程同时生成，采用最先完成的结果，
+    # 其余进程收到取消信号后放弃任务。数值为参赛的进程数（空闲进程不足时按实际数量），建议不超过 workers
+    'portfolio': {
+        16: 2,
+        25: 2,
+        36: 2
+    },
+    # 参赛者依次轮换使用的求解后端，未配置时都使用 backends 中的后端（仅随机种子不同）
+    'portfolio_backends': {
+        16: ['bitmask', 'sat']
+    },
+    'cancel_grace': 5  # 被取消的进程在该时间（秒）内没有放弃任务时被结束并替换
+}
+
+
+# 持久化题库配置（SQLite，多个工作进程共享，重启后库存保留）
+BANK_CONFIG = {
+    'enabled': True,  # 是否启用持久化题库
+    'path': 'puzzle_bank.sqlite3',  # 数据库文件路径（相对路径基于app.py所在目录）
+    'target_per_size': 1000,  # 每个阶数的目标库存量，达到后不再写入
+    # 每一类数独（互为对称变换）在题库中最多保留的份数，超出的副本和重复生成的数独不再写入
+    'copies_per_class': 1
+}
+
+# 补充调度器配置
+SCHEDULER_CONFIG = {
+    'max_concurrent': 2,  # 同时进行的生成任务上限
+    'low_watermark': 20,  # 库存（缓存+题库）不高于该值时开始补充
+    'high_watermark': 200,  # 补充到该库存后停止
+    'rate_window': 60,  # 统计请求速率的时间窗口（秒）
+    # 单独为某些阶数设置 (低水位, 高水位)
+    'watermarks': {
+        16: (10, 100),
+        25: (3, 30),
+        36: (2, 15)
+    }
+}
+# 启动预热配置
+WARMUP_CONFIG = {
+    # 缓存快照文件（相对路径基于app.py所在目录），退出时保存、启动时加载；设为None禁用快照
+    # 每个进程保存到加上进程号的文件，启动时加载已退出进程留下的全部快照
+    'snapshot_path': 'cache_snapshot.json',
+    'snapshot_interval': 60,  # 定期保存快照的间隔（秒），0表示只在退出时保存
+    'timeout': 60,  # 每个阶数预热生成的最长时间（秒）
+    # /ready 要求有库存的阶数，大阶数生成较慢，可以不计入就绪检查
+    'ready_sizes': [4, 9, 16]
+}
+
+# 页面和响应压缩配置
+WEB_CONFIG = {
+    'shell_max_age': 60,  # 页面外壳的缓存时间（秒），过期后用ETag验证，内容未变时返回304
+    'compress_min_size': 512,  # 小于该字节数的响应不压缩
+    'compress_level': 6,  # gzip压缩级别（1-9），安装brotli库时优先使用brotli
+    'recent_solutions': 4096,  # 记住最近发出的数独的解，客户端请求答案时不需要重新求解
+    # 没有库存时请求等待正在生成的数独的最长时间（秒），新数独一生成就返回；0表示立即返回“生成中”
+    'puzzle_wait_timeout': 2,
+    # 事件流（/events）：生成中的数独和未完成的AI提示就绪时由服务端推送，客户端不需要反复请求
+    'events_timeout': 60,  # 事件流最长保持的时间（秒），超过后推送 timeout 事件并关闭
+    'events_heartbeat': 15,  # 心跳间隔（秒），避免代理断开空闲连接
+    'events_retry': 5000  # 连接意外断开后浏览器重新连接前等待的时间（毫秒）
+}
+
+# 日志和生成追踪配置
+TRACE_CONFIG = {
+    'log_level': 'INFO',  # 日志级别，日志以JSON行输出到标准输出
+    'log_traces': True,  # 后台生成的日志附带追踪记录（各阶段耗时、重试次数、z3求解器统计）
+    # 保存cProfile结果的目录（相对路径基于app.py所在目录），None表示不做性能分析
+    'profile_dir': None,
+    'profile_sample_rate': 0.01  # 被采样做性能分析的生成任务比例
+}
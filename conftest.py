@@ -0,0 +1,11 @@
+"""
+测试公共设置：没有本地配置 config.py 时（例如在CI中）使用 config_template.py
+"""
+
+import importlib
+import sys
+
+try:
+    importlib.import_module('config')
+except ImportError:
+    sys.modules['config'] = importlib.import_module('config_template')
@@ -0,0 +1,134 @@
+"""
+数独指纹
+对称变换（数字重新编号、带内行交换、带交换、栈内列交换、栈交换、转置）得到的数独本质上是同一道题。
+规范形式取所有变换结果中字典序最小的一个（空格为0，数字按首次出现的顺序重新编号），
+指纹是规范形式的哈希，同一类数独的指纹相同。
+
+逐行分支定界求最小字典序：每一层只保留当前前缀最小的候选，
+9阶及以下枚举全部列排列，结果精确；更大的阶数列排列过多，由第一行和不变的列特征确定列顺序，
+结果仍是该数独的一个变换（指纹相同的数独一定等价），只有列特征完全相同时
+等价的数独才可能得到不同的指纹。
+"""
+
+import hashlib
+from itertools import permutations, product
+
+from puzzle import Puzzle
+
+EXACT_MAX_SIZE = 9  # 不超过该阶数时枚举全部列排列
+DEFAULT_BEAM = 4096  # 每层最多保留的候选数，防止高度对称的题目使搜索爆炸
+
+_column_orders = {}
+
+
+def _band_orders(n):
+    """n阶数独所有保持宫格结构的列（或行）排列"""
+    orders = _column_orders.get(n)
+    if orders is None:
+        box = int(n ** 0.5)
+        inner = list(permutations(range(box)))
+        orders = []
+        for stacks in permutations(range(box)):
+            for within in product(inner, repeat=box):
+                orders.append(tuple(stack * box + within[k][m]
+                                    for k, stack in enumerate(stacks) for m in range(box)))
+        _column_orders[n] = orders
+    return orders
+
+
+def _column_signatures(g, n):
+    """
+    每列在行、列排列和数字重新编号下不变的特征：线索数，以及有线索的各行的线索数（排序后）
+    """
+    row_counts = [sum(1 for v in row if v) for row in g]
+    return [(sum(1 for r in range(n) if g[r][c]),
+             tuple(sorted(row_counts[r] for r in range(n) if g[r][c]))) for c in range(n)]
+
+
+def _greedy_order(box, g, row, signatures):
+    """
+    为大数独确定列顺序：使第一行的空格尽量靠前（数字按首次出现重新编号，
+    第一行只有空格的位置影响字典序），并列时按列特征排序；
+    列顺序只由不变的特征决定，等价的数独得到对应的列顺序
+    """
+    def column_key(c):
+        return (g[row][c] != 0, signatures[c])
+
+    stacks = []
+    for stack in range(box):
+        columns = sorted(range(stack * box, (stack + 1) * box), key=column_key)
+        stacks.append((tuple(column_key(c) for c in columns), columns))
+    stacks.sort(key=lambda item: item[0])
+    return tuple(c for _, columns in stacks for c in columns)
+
+
+def _relabel(values, labels, next_label):
+    """按首次出现的顺序重新编号一行，返回 (编号后的行, 新的编号表, 下一个编号)"""
+    out = []
+    for v in values:
+        if v:
+            label = labels.get(v)
+            if label is None:
+                labels = dict(labels)
+                label = labels[v] = next_label
+                next_label += 1
+            out.append(label)
+        else:
+            out.append(0)
+    return tuple(out), labels, next_label
+
+
+def canonical_form(puzzle, beam=DEFAULT_BEAM):
+    """
+    求数独的规范形式
+    :param puzzle: Puzzle
+    :param beam: 每层最多保留的候选数
+    :return: 规范形式的 Puzzle
+    """
+    n = puzzle.n
+    box = int(n ** 0.5)
+    grid = puzzle.to_grid()
+    grids = [grid, [list(col) for col in zip(*grid)]]
+
+    # 候选: (网格, 列顺序, 已用的行, 编号表, 下一个编号)
+    states = []
+    if n <= EXACT_MAX_SIZE:
+        for g in grids:
+            for order in _band_orders(n):
+                states.append((g, order, (), {}, 1))
+    else:
+        for g in grids:
+            signatures = _column_signatures(g, n)
+            for row in range(n):
+                order = _greedy_order(box, g, row, signatures)
+                states.append((g, order, (row,), {}, 1))
+
+    result = []
+    for level in range(n):
+        best, survivors = None, []
+        for g, order, used, labels, next_label in states:
+            if len(used) > level:
+                # 大数独的第一行已经确定
+                candidates = (used[level],)
+                used = used[:level]
+            elif level % box == 0:
+                # 开始新的带：任选一个未用过的带中的任一行
+                used_bands = {r // box for r in used}
+                candidates = [r for r in range(n) if r // box not in used_bands]
+            else:
+                band = used[-1] // box
+                candidates = [r for r in range(band * box, (band + 1) * box) if r not in used]
+            for r in candidates:
+                row, new_labels, new_next = _relabel([g[r][c] for c in order], labels, next_label)
+                if best is None or row < best:
+                    best, survivors = row, []
+                if row == best and len(survivors) < beam:
+                    survivors.append((g, order, used + (r,), new_labels, new_next))
+        result.append(best)
+        states = survivors
+    return Puzzle(bytes(v for row in result for v in row))
+
+
+def fingerprint(puzzle):
+    """数独指纹：规范形式的SHA-1（十六进制），对称变换不改变指纹"""
+    return hashlib.sha1(canonical_form(puzzle).cells).hexdigest()
@@ -0,0 +1,496 @@
+"""
+数独生成进程池
+常驻工作进程只导入一次 test.generate_sudoku 和求解后端（含z3），
+通过任务队列接收生成任务，并以结构化结果返回数独。
+大数独的生成耗时波动很大，可以用组合求解（race）把同一个任务交给多个工作进程，
+以不同的随机种子和求解后端同时生成，采用最先完成的结果并取消其余的任务。
+每个任务都带回追踪记录（各阶段耗时、重试次数和求解器统计），可以对采样的任务做cProfile性能分析。
+ThreadGeneratorPool 提供相同的接口，在本进程的常驻线程中生成，不启动子进程。
+"""
+
+import importlib
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+from multiprocessing.connection import wait
+
+
+class GenerationError(Exception):
+    """生成任务失败，trace 为工作进程返回的追踪记录（没有时为None）"""
+
+    def __init__(self, message, trace=None):
+        super().__init__(message)
+        self.trace = trace
+
+
+class GenerationTimeout(GenerationError):
+    """生成任务超时"""
+
+
+class GenerationOverBudget(GenerationError):
+    """超过时间预算，工作进程放弃了这次生成（没有被强制结束）"""
+
+
+class _Cancelled(Exception):
+    """组合求解中其他工作进程已经完成，本任务被取消"""
+
+
+def _run_job(job, cancel):
+    """
+    执行一个生成任务（在工作进程或工作线程中）
+    :param job: 任务参数
+    :param cancel: 取消信号（Event），生成过程中定期检查，收到后放弃任务
+    :return: 结果字典，失败时包含 'error'
+    """
+    from test import BudgetExceeded, generate_sudoku
+    from rating import rate_puzzle
+    from puzzle import Puzzle
+    from fingerprint import fingerprint
+    from tracing import Trace, profiled
+
+    def check_cancel(stage, done, total):
+        # 生成过程中定期回调，收到取消信号时放弃当前任务，进程（线程）保留
+        if cancel.is_set():
+            raise _Cancelled()
+
+    stats = {}
+    trace = Trace(size=job['size'], backend=job.get('backend'), mode=job.get('mode', 'random'),
+                  pid=os.getpid())
+    if job.get('profile_dir'):
+        # 被采样的任务保存cProfile结果，文件路径记录在追踪记录中
+        trace.attributes['profile'] = os.path.join(
+            job['profile_dir'],
+            f"generate-{job['size']}-{os.getpid()}-{threading.get_ident()}-{int(time.time() * 1000)}.prof")
+    try:
+        if job.get('seed') is not None:
+            random.seed(job['seed'])
+        with profiled(trace.attributes.get('profile')):
+            puzzle, solution = generate_sudoku(job['size'], backend=job.get('backend'),
+                                               mode=job.get('mode', 'random'),
+                                               target_clues=job.get('target_clues'),
+                                               stats=stats,
+                                               time_budget=job.get('time_budget'),
+                                               progress=check_cancel,
+                                               check_timeout=job.get('check_timeout'),
+                                               max_clues=job.get('max_clues'),
+                                               trace=trace)
+        # 以紧凑的 Puzzle 传回主进程，序列化后只有两段bytes；评级和指纹也在工作进程中计算
+        compact = Puzzle.from_grid(puzzle)
+        return {'puzzle': compact, 'solution': Puzzle.from_grid(solution),
+                'difficulty': rate_puzzle(puzzle)['difficulty'],
+                'fingerprint': fingerprint(compact),
+                'outcome': stats.get('outcome', 'complete'),
+                'clues': compact.clues,
+                'check_timeouts': stats.get('check_timeouts', 0),
+                'backend': job.get('backend'),
+                'trace': trace.to_dict(stats)}
+    except _Cancelled:
+        return {'error': '任务已取消', 'cancelled': True}
+    except BudgetExceeded as e:
+        return {'error': str(e), 'outcome': 'rejected', 'trace': trace.to_dict(stats)}
+    except Exception as e:
+        return {'error': str(e), 'trace': trace.to_dict(stats)}
+    except KeyboardInterrupt:
+        raise
+    except BaseException as e:
+        # 例如SystemExit：工作线程不能因为任务而退出，否则永远不会回到空闲队列
+        return {'error': f'任务异常退出: {type(e).__name__}({e})', 'trace': trace.to_dict(stats)}
+
+
+def _result(result):
+    """把工作进程（线程）返回的错误转换为异常"""
+    if result.get('outcome') == 'rejected':
+        raise GenerationOverBudget(result['error'], result.get('trace'))
+    if 'error' in result:
+        raise GenerationError(result['error'], result.get('trace'))
+    return result
+
+
+def _worker_main(conn, cancel):
+    """工作进程主循环：导入一次生成器，然后逐个处理任务"""
+    # 领取任务之前导入一次生成器和求解后端（只为预加载，不绑定名字），
+    # 之后 _run_job 中的导入直接命中模块缓存，没有导入开销
+    importlib.import_module('test')
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:  # 退出信号
+            break
+        conn.send(_run_job(job, cancel))
+
+
+class _Worker:
+    """单个常驻工作进程及其通信管道"""
+
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.cancel = ctx.Event()  # 组合求解时通知进程放弃当前任务
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, self.cancel))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+
+    def stop(self, timeout=1):
+        """通知进程退出，超时则强制结束"""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+    def kill(self):
+        """立即结束进程"""
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+        self.conn.close()
+
+
+class GeneratorPool:
+    """
+    常驻的数独生成进程池
+    :param workers: 工作进程数量
+    :param job_timeout: 单个任务的超时时间（秒），超时的进程会被结束并替换
+    :param max_jobs_per_worker: 每个进程处理多少个任务后被回收重建，0表示不回收
+    :param cancel_grace: 组合求解中被取消的进程在该时间（秒）内没有放弃任务时被结束并替换
+    """
+
+    def __init__(self, workers=2, job_timeout=30, max_jobs_per_worker=50, cancel_grace=5):
+        self.workers = max(1, int(workers))
+        self.job_timeout = job_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.cancel_grace = cancel_grace
+        self._ctx = multiprocessing.get_context()
+        self._idle = queue.Queue()  # 空闲工作进程队列，任务按到达顺序依次领取
+        self._lock = threading.Lock()
+        self._all = []
+        self._closed = False
+
+    def start(self):
+        """启动所有工作进程"""
+        with self._lock:
+            while len(self._all) < self.workers:
+                self._release(self._spawn())
+        return self
+
+    def _spawn(self):
+        worker = _Worker(self._ctx)
+        self._all.append(worker)
+        return worker
+
+    def _release(self, worker):
+        self._idle.put(worker)
+
+    def _replace(self, worker):
+        """结束一个工作进程并补充新的进程"""
+        with self._lock:
+            if worker in self._all:
+                self._all.remove(worker)
+            worker.kill()
+            if not self._closed:
+                self._release(self._spawn())
+
+    def _recycle(self, worker):
+        """任务数达到上限的进程正常退出并重建"""
+        with self._lock:
+            if worker in self._all:
+                self._all.remove(worker)
+            worker.stop()
+            if not self._closed:
+                self._release(self._spawn())
+
+    def generate(self, size, backend=None, mode='random', target_clues=None, timeout=None,
+                 time_budget=None, check_timeout=None, max_clues=None, profile_dir=None):
+        """
+        在工作进程中生成一个数独
+        :param size: 数独阶数
+        :param backend: 求解后端名称，None表示默认后端
+        :param mode: 挖空方式，'random' 或 'dig'
+        :param target_clues: 'dig' 模式下的目标线索数量
+        :param timeout: 本次任务的超时时间，默认使用 job_timeout
+        :param time_budget: 生成的时间预算（秒），超过后停止挖空，返回线索较多的题目
+        :param check_timeout: 单次唯一解检查的时间上限（秒）
+        :param max_clues: 超时后保留的线索超过该数量时放弃，抛出GenerationOverBudget
+        :param profile_dir: 对本次任务进行cProfile性能分析，结果保存到该目录
+        :return: {'puzzle': 题目, 'solution': 解, 'difficulty': 难度, 'fingerprint': 指纹,
+                  'outcome': 'complete' 或 'partial', 'clues': 线索数, 'check_timeouts': 超时的检查次数,
+                  'trace': 追踪记录（见 tracing.Trace.to_dict）}
+        """
+        if self._closed:
+            raise GenerationError("生成进程池已关闭")
+        if timeout is None:
+            timeout = self.job_timeout
+
+        worker = self._idle.get()  # 等待空闲的工作进程
+        try:
+            worker.conn.send({'size': size, 'backend': backend, 'mode': mode,
+                              'target_clues': target_clues, 'time_budget': time_budget,
+                              'check_timeout': check_timeout, 'max_clues': max_clues,
+                              'profile_dir': profile_dir})
+            if not worker.conn.poll(timeout):
+                self._replace(worker)
+                raise GenerationTimeout(f"生成 {size} 阶数独超过 {timeout} 秒")
+            result = worker.conn.recv()
+        except GenerationTimeout:
+            raise
+        except (EOFError, OSError) as e:
+            # 工作进程意外退出（例如缺少z3时 generate_sudoku 会直接退出）
+            self._replace(worker)
+            raise GenerationError(f"工作进程异常退出: {e}")
+
+        self._done(worker)
+        return _result(result)
+
+    def race(self, size, racers, backends=None, mode='random', target_clues=None, timeout=None,
+             time_budget=None, check_timeout=None, max_clues=None, profile_dir=None):
+        """
+        组合求解：把同一个生成任务交给多个工作进程，各自使用不同的随机种子，
+        并依次轮换 backends 中的求解后端，返回最先成功的结果，其余任务被取消
+        没有足够的空闲进程时只用现有的空闲进程参赛（至少一个）
+        :param racers: 参赛的工作进程数
+        :param backends: 参赛者轮换使用的求解后端列表，None表示都使用默认后端
+        其余参数与 generate 相同
+        :return: 与 generate 相同，另外 'racers' 为参赛者数量
+        """
+        if self._closed:
+            raise GenerationError("生成进程池已关闭")
+        if timeout is None:
+            timeout = self.job_timeout
+        backends = list(backends or [None])
+
+        workers = [self._idle.get()]  # 至少等到一个空闲的工作进程
+        while len(workers) < racers:
+            try:
+                workers.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+        pending = {}
+        for k, worker in enumerate(workers):
+            try:
+                worker.conn.send({'size': size, 'backend': backends[k % len(backends)], 'mode': mode,
+                                  'target_clues': target_clues, 'time_budget': time_budget,
+                                  'check_timeout': check_timeout, 'max_clues': max_clues,
+                                  'seed': random.getrandbits(64), 'profile_dir': profile_dir})
+                pending[worker.conn] = worker
+            except OSError:
+                self._replace(worker)
+
+        winner, failures = None, []
+        deadline = time.monotonic() + timeout
+        while pending and winner is None:
+            ready = wait(list(pending), max(0, deadline - time.monotonic()))
+            if not ready:
+                break
+            for conn in ready:
+                worker = pending.pop(conn)
+                try:
+                    result = conn.recv()
+                except (EOFError, OSError) as e:
+                    self._replace(worker)
+                    failures.append({'error': f"工作进程异常退出: {e}"})
+                    continue
+                self._done(worker)
+                if 'error' in result:
+                    failures.append(result)
+                    continue
+                winner = result
+                break
+
+        # 其余参赛者收到取消信号后放弃任务，工作进程继续保留
+        self._cancel(list(pending.values()))
+        if winner is not None:
+            winner['racers'] = len(workers)
+            return winner
+        if not failures:
+            raise GenerationTimeout(f"生成 {size} 阶数独超过 {timeout} 秒")
+        # 所有参赛者都失败时，优先报告超过预算的失败
+        failures.sort(key=lambda result: result.get('outcome') != 'rejected')
+        return _result(failures[0])
+
+    def _cancel(self, workers):
+        """取消工作进程的当前任务，在后台等待它们放弃任务后放回空闲队列，超过宽限时间的进程被替换"""
+        if not workers:
+            return
+        for worker in workers:
+            worker.cancel.set()
+
+        def reap():
+            deadline = time.monotonic() + self.cancel_grace
+            pending = {worker.conn: worker for worker in workers}
+            while pending:
+                ready = wait(list(pending), max(0, deadline - time.monotonic()))
+                if not ready:
+                    break
+                for conn in ready:
+                    worker = pending.pop(conn)
+                    try:
+                        conn.recv()  # 丢弃被取消（或恰好完成）的结果
+                    except (EOFError, OSError):
+                        self._replace(worker)
+                        continue
+                    self._done(worker)
+            for worker in pending.values():
+                self._replace(worker)
+
+        threading.Thread(target=reap, daemon=True).start()
+
+    def _done(self, worker):
+        """工作进程完成一个任务：放回空闲队列，任务数达到上限时回收"""
+        worker.cancel.clear()
+        worker.jobs_done += 1
+        if self.max_jobs_per_worker and worker.jobs_done >= self.max_jobs_per_worker:
+            self._recycle(worker)
+        else:
+            self._release(worker)
+
+    def shutdown(self):
+        """关闭进程池并结束所有工作进程"""
+        with self._lock:
+            self._closed = True
+            workers, self._all = self._all, []
+        for worker in workers:
+            worker.stop()
+
+
+class _ThreadWorker:
+    """
+    常驻工作线程
+    z3后端的上下文和编译好的约束模型属于线程，线程常驻时每个阶数的约束只构建一次
+    """
+
+    def __init__(self, pool, name):
+        self.pool = pool
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._main, name=name, daemon=True)
+        self.thread.start()
+
+    def _main(self):
+        while True:
+            item = self.jobs.get()
+            if item is None:  # 退出信号
+                break
+            job, cancel, results = item
+            result = _run_job(job, cancel)
+            # 先回到空闲队列再交付结果：超时被放弃的任务结束后线程同样可以继续使用
+            self.pool._release(self)
+            results.put(result)
+
+
+class ThreadGeneratorPool:
+    """
+    线程版的数独生成池，接口与 GeneratorPool 相同，不启动子进程
+    z3/sat 后端在每个线程中使用自己的z3上下文，求解时释放GIL，多个线程可以并行；
+    纯Python的 bitmask 后端受GIL限制，线程之间不能并行。
+    线程无法被强制结束：超时或在组合求解中落败的任务收到取消信号，在下一次进度回调时放弃，
+    时间预算保证任务最终会结束，结束前该线程不会领取新任务
+    :param workers: 工作线程数量
+    :param job_timeout: 单个任务的超时时间（秒）
+    """
+
+    def __init__(self, workers=2, job_timeout=30):
+        self.workers = max(1, int(workers))
+        self.job_timeout = job_timeout
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._all = []
+        self._closed = False
+
+    def start(self):
+        """启动所有工作线程"""
+        with self._lock:
+            while len(self._all) < self.workers:
+                worker = _ThreadWorker(self, f'generator-{len(self._all)}')
+                self._all.append(worker)
+                self._release(worker)
+        return self
+
+    def _release(self, worker):
+        if not self._closed:
+            self._idle.put(worker)
+
+    def generate(self, size, backend=None, mode='random', target_clues=None, timeout=None,
+                 time_budget=None, check_timeout=None, max_clues=None, profile_dir=None):
+        """在工作线程中生成一个数独，参数和返回值与 GeneratorPool.generate 相同"""
+        if self._closed:
+            raise GenerationError("生成进程池已关闭")
+        if timeout is None:
+            timeout = self.job_timeout
+
+        worker = self._idle.get()  # 等待空闲的工作线程
+        cancel, results = threading.Event(), queue.Queue()
+        worker.jobs.put(({'size': size, 'backend': backend, 'mode': mode,
+                          'target_clues': target_clues, 'time_budget': time_budget,
+                          'check_timeout': check_timeout, 'max_clues': max_clues,
+                          'profile_dir': profile_dir}, cancel, results))
+        try:
+            result = results.get(timeout=timeout)
+        except queue.Empty:
+            cancel.set()
+            raise GenerationTimeout(f"生成 {size} 阶数独超过 {timeout} 秒")
+        return _result(result)
+
+    def race(self, size, racers, backends=None, mode='random', target_clues=None, timeout=None,
+             time_budget=None, check_timeout=None, max_clues=None, profile_dir=None):
+        """
+        组合求解，参数和返回值与 GeneratorPool.race 相同
+        线程共用 random 模块的随机状态，各参赛者自然取到不同的随机数，不再单独设置种子
+        """
+        if self._closed:
+            raise GenerationError("生成进程池已关闭")
+        if timeout is None:
+            timeout = self.job_timeout
+        backends = list(backends or [None])
+
+        workers = [self._idle.get()]  # 至少等到一个空闲的工作线程
+        while len(workers) < racers:
+            try:
+                workers.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+        cancel, results = threading.Event(), queue.Queue()
+        for k, worker in enumerate(workers):
+            worker.jobs.put(({'size': size, 'backend': backends[k % len(backends)], 'mode': mode,
+                              'target_clues': target_clues, 'time_budget': time_budget,
+                              'check_timeout': check_timeout, 'max_clues': max_clues,
+                              'profile_dir': profile_dir}, cancel, results))
+
+        winner, failures = None, []
+        deadline = time.monotonic() + timeout
+        while winner is None and len(failures) < len(workers):
+            try:
+                result = results.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if 'error' in result:
+                failures.append(result)
+            else:
+                winner = result
+
+        # 其余参赛者收到取消信号后放弃任务，结束后线程自动回到空闲队列
+        cancel.set()
+        if winner is not None:
+            winner['racers'] = len(workers)
+            return winner
+        if not failures:
+            raise GenerationTimeout(f"生成 {size} 阶数独超过 {timeout} 秒")
+        # 所有参赛者都失败时，优先报告超过预算的失败
+        failures.sort(key=lambda result: result.get('outcome') != 'rejected')
+        return _result(failures[0])
+
+    def shutdown(self):
+        """关闭生成池，工作线程完成当前任务后退出"""
+        with self._lock:
+            self._closed = True
+            workers, self._all = self._all, []
+        for worker in workers:
+            worker.jobs.put(None)
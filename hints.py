@@ -0,0 +1,76 @@
+"""
+本地提示引擎
+根据客户端发送的当前盘面，用最简单的可用解题技巧找出下一步可以确定的格子，
+无需调用远程AI接口。
+"""
+
+from rating import LogicalSolver
+
+
+def parse_state(n, current_state):
+    """
+    解析客户端发送的盘面
+    :param current_state: n×n 列表（元素为数字或字符串，空格为 '0' 或 ''）
+    :return: n×n 整数列表，格式不正确时返回None
+    """
+    if not isinstance(current_state, list) or len(current_state) != n:
+        return None
+    grid = []
+    for row in current_state:
+        if not isinstance(row, list) or len(row) != n:
+            return None
+        parsed = []
+        for cell in row:
+            text = str(cell).strip()
+            if not text:
+                parsed.append(0)
+                continue
+            try:
+                value = int(text)
+            except ValueError:
+                return None
+            if not 0 <= value <= n:
+                return None
+            parsed.append(value)
+        grid.append(parsed)
+    return grid
+
+
+def describe(step):
+    """把提示步骤转换为一句话"""
+    row, col = step['cell']
+    text = f"第{row + 1}行第{col + 1}列可以填 {step['value']}（{step['name']}）"
+    if step['before']:
+        names = '、'.join(dict.fromkeys(before['name'] for before in step['before']))
+        text = f"先用{names}排除候选数后，{text}"
+    return text
+
+
+def find_hint(n, current_state):
+    """
+    找出下一步最简单的推理
+    :param n: 数独阶数
+    :param current_state: 客户端发送的当前盘面
+    :return: {'cell': (行, 列), 'value': 数字, 'technique': 技巧, 'name': 技巧名称,
+              'before': 之前需要的删除候选数步骤}，找不到时返回None
+    """
+    grid = parse_state(n, current_state)
+    if grid is None:
+        return None
+    try:
+        solver = LogicalSolver(grid)
+    except ValueError:
+        return None
+    if not solver.valid:
+        return None
+
+    placement, before = solver.next_placement()
+    if placement is None:
+        return None
+    return {
+        'cell': placement['cell'],
+        'value': placement['value'],
+        'technique': placement['technique'],
+        'name': placement['name'],
+        'before': [{'technique': step['technique'], 'name': step['name']} for step in before]
+    }
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+端到端压测
+按泊松到达（开环，延迟从计划发出的时刻算起，服务变慢时不会少发请求）并发请求
+POST /（生成数独）、/refresh 和 /hint，可配置阶数比例、请求比例和到达速率，统计：
+- 各接口的吞吐量和 p50/p95/p99 延迟
+- 返回“生成中/初始化中”而不是数独的比例（缓存耗尽）
+- 提示请求中由AI返回、等待中（返回票据）的比例
+结果可保存为JSON，用 --compare 与之前的结果对比，在上线前比较缓存和调度器配置。
+
+默认在本进程内启动应用（使用临时题库，不影响正式题库）和本地AI桩服务（ai_stub.py），
+/hint 调用的AI接口指向桩服务；也可以用 --url 压测已经运行的服务。
+
+用法: python loadtest.py --rate 20 --duration 60 --sizes 4:1 9:3 16:1 --mix puzzle:8 refresh:1 hint:1 --output load.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmark import git_commit, percentile
+
+KINDS = ('puzzle', 'refresh', 'hint')
+DRY_MESSAGES = {'generating': '生成中，请稍后再试', 'initializing': '初始化中，请稍后再试'}
+_INITIAL = re.compile(r'renderPuzzle\((\{.*?\})\);')
+
+
+def parse_weights(items, cast=str):
+    """解析 ['4:1', '9:3'] 形式的比例"""
+    weights = {}
+    for item in items:
+        key, _, weight = item.partition(':')
+        weights[cast(key)] = float(weight or 1)
+    return weights
+
+
+class LoadTest:
+    """
+    压测运行器
+    :param base_url: 被测服务地址
+    :param sizes: {阶数: 权重}
+    :param mix: {请求类型: 权重}，类型为 puzzle、refresh、hint
+    :param concurrency: 客户端并发线程数
+    """
+
+    def __init__(self, base_url, sizes, mix, concurrency=32, seed=None):
+        self.base_url = base_url.rstrip('/')
+        self.sizes = sizes
+        self.mix = mix
+        self.concurrency = concurrency
+        self.rng = random.Random(seed)
+        self.results = []  # (类型, 延迟秒, 结果)
+        self.lock = threading.Lock()
+        self.puzzles = deque(maxlen=500)  # 已收到的数独，供刷新和提示请求使用
+        self.local = threading.local()
+
+    def _session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session
+
+    def _pick(self, weights):
+        keys = list(weights)
+        return self.rng.choices(keys, weights=[weights[key] for key in keys])[0]
+
+    def request_puzzle(self, size):
+        response = self._session().post(f'{self.base_url}/', data={'n': size}, timeout=60)
+        if response.status_code != 200:
+            return 'error'
+        text = response.text
+        match = _INITIAL.search(text)
+        if match:
+            self.puzzles.append(json.loads(match.group(1)))
+            return 'ok'
+        for outcome, message in DRY_MESSAGES.items():
+            if message in text:
+                return outcome
+        return 'error'
+
+    def request_refresh(self, data):
+        response = self._session().post(f'{self.base_url}/refresh',
+                                        json={'n': data['n'], 'puzzle': data['puzzle']}, timeout=60)
+        if response.status_code != 200 or not response.json().get('success'):
+            return 'error'
+        return 'duplicate' if response.json().get('duplicate') else 'ok'
+
+    def request_hint(self, data):
+        from puzzle import Puzzle
+        state = [[str(cell) for cell in row] for row in Puzzle.from_string(data['puzzle']).to_grid()]
+        response = self._session().post(f'{self.base_url}/hint',
+                                        json={'n': data['n'], 'current_state': state}, timeout=60)
+        if response.status_code != 200:
+            return 'error'
+        result = response.json()
+        if not result.get('success'):
+            return 'error'
+        if result.get('pending'):
+            return 'pending'
+        return result.get('source', 'ai')
+
+    def _one(self, kind, size, scheduled):
+        data = None
+        if kind != 'puzzle':
+            try:
+                data = self.puzzles.popleft() if kind == 'refresh' else self.puzzles[-1]
+            except IndexError:
+                kind = 'puzzle'  # 还没有收到数独时改为请求数独
+        try:
+            if kind == 'puzzle':
+                outcome = self.request_puzzle(size)
+            elif kind == 'refresh':
+                outcome = self.request_refresh(data)
+            else:
+                outcome = self.request_hint(data)
+        except (requests.RequestException, ValueError):
+            outcome = 'error'
+        latency = time.perf_counter() - scheduled
+        with self.lock:
+            self.results.append((kind, latency, outcome))
+
+    def run(self, rate, duration):
+        """按泊松到达发出请求，返回实际持续时间（秒）"""
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            start = time.perf_counter()
+            offset = 0.0
+            while True:
+                offset += self.rng.expovariate(rate)
+                if offset > duration:
+                    break
+                scheduled = start + offset
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._one, self._pick(self.mix), self._pick(self.sizes), scheduled)
+        return time.perf_counter() - start
+
+    def report(self, elapsed):
+        """汇总各接口的吞吐量、延迟分位数和结果比例"""
+        endpoints = {}
+        for kind in KINDS:
+            rows = [(latency, outcome) for k, latency, outcome in self.results if k == kind]
+            if not rows:
+                continue
+            latencies = [latency for latency, _ in rows]
+            outcomes = {}
+            for _, outcome in rows:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            endpoints[kind] = {
+                'count': len(rows),
+                'throughput': len(rows) / elapsed,
+                'latency_ms': {f'p{q}': percentile(latencies, q) * 1000 for q in (50, 95, 99)},
+                'outcomes': outcomes,
+                'shares': {outcome: count / len(rows) for outcome, count in outcomes.items()}
+            }
+        puzzle = endpoints.get('puzzle', {'count': 0, 'outcomes': {}})
+        dry = sum(puzzle['outcomes'].get(outcome, 0) for outcome in DRY_MESSAGES)
+        return {
+            'elapsed': elapsed,
+            'requests': len(self.results),
+            'throughput': len(self.results) / elapsed,
+            'dry_share': dry / puzzle['count'] if puzzle['count'] else None,
+            'endpoints': endpoints
+        }
+
+
+def start_local_app(args):
+    """
+    在本进程内启动应用和AI桩服务
+    :return: (服务地址, 桩服务器对象)
+    """
+    from ai_stub import start_stub_server
+    import config
+
+    stub, stub_url = start_stub_server(delay=args.stub_delay, error_rate=args.stub_error_rate)
+    # 导入应用之前修改配置：临时题库、不读写缓存快照、AI接口指向桩服务
+    bank_path = args.bank or os.path.join(tempfile.mkdtemp(prefix='sudoku-load-'), 'bank.sqlite3')
+    config.BANK_CONFIG = dict(getattr(config, 'BANK_CONFIG', {}), path=bank_path)
+    config.WARMUP_CONFIG = dict(getattr(config, 'WARMUP_CONFIG', {}), snapshot_path=None)
+    config.AI_CONFIG = dict(config.AI_CONFIG, api_url=stub_url, api_key='stub', enabled=True,
+                            prose=args.prose)
+
+    import app as sudoku_app
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass  # 压测时不输出每条请求日志
+
+    if not args.no_warmup:
+        sudoku_app.create_app()
+    server = make_server('127.0.0.1', 0, sudoku_app.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', stub
+
+
+def wait_ready(base_url, timeout):
+    """等待 /ready 返回200"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{base_url}/ready', timeout=5).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def server_settings(base_url):
+    """记录被测服务的调度器状态，便于比较不同配置"""
+    try:
+        return requests.get(f'{base_url}/scheduler', timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def print_report(result, baseline=None):
+    """打印各接口的结果，提供基准结果时附加p99和缓存耗尽比例的变化"""
+    previous = (baseline or {}).get('report', {}).get('endpoints', {})
+    print(f"{'endpoint':<10}{'count':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'vs base p99':>13}  outcomes")
+    for kind, stats in result['endpoints'].items():
+        latency = stats['latency_ms']
+        line = (f"{kind:<10}{stats['count']:>8}{stats['throughput']:>9.1f}{latency['p50']:>10.1f}"
+                f"{latency['p95']:>10.1f}{latency['p99']:>10.1f}")
+        old = previous.get(kind)
+        if old and old['latency_ms']['p99']:
+            line += f"{latency['p99'] / old['latency_ms']['p99'] - 1:>+13.1%}"
+        else:
+            line += ' ' * 13
+        shares = ', '.join(f"{outcome} {share:.1%}" for outcome, share in sorted(stats['shares'].items()))
+        print(f"{line}  {shares}")
+    if result['dry_share'] is not None:
+        line = f"生成中/初始化中比例: {result['dry_share']:.1%}"
+        old_share = (baseline or {}).get('report', {}).get('dry_share')
+        if old_share is not None:
+            line += f"（基准 {old_share:.1%}）"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数独服务端到端压测')
+    parser.add_argument('--url', help='被测服务地址，不提供时在本进程内启动应用和AI桩服务')
+    parser.add_argument('--rate', type=float, default=10, help='平均每秒请求数（泊松到达）')
+    parser.add_argument('--duration', type=float, default=30, help='压测时长（秒）')
+    parser.add_argument('--sizes', nargs='+', default=['4:1', '9:3', '16:1'], help='阶数比例，如 4:1 9:3 16:1')
+    parser.add_argument('--mix', nargs='+', default=['puzzle:8', 'refresh:1', 'hint:1'],
+                        help='请求比例，类型为 puzzle（POST /）、refresh、hint')
+    parser.add_argument('--concurrency', type=int, default=32, help='客户端并发线程数')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子，使请求序列可复现')
+    parser.add_argument('--wait-ready', type=float, default=0, help='开始前最多等待 /ready 的时间（秒）')
+    parser.add_argument('--no-warmup', action='store_true', help='本进程内启动时不预热缓存（测试冷启动）')
+    parser.add_argument('--bank', help='本进程内启动时使用的题库文件，默认使用临时的空题库')
+    parser.add_argument('--prose', action='store_true', help='提示总是调用AI（桩服务）而不是本地提示引擎')
+    parser.add_argument('--stub-delay', type=float, default=0.5, help='AI桩服务的模拟延迟（秒）')
+    parser.add_argument('--stub-error-rate', type=float, default=0.0, help='AI桩服务返回500错误的比例')
+    parser.add_argument('--output', help='保存JSON结果的路径')
+    parser.add_argument('--compare', help='之前保存的JSON结果，用于对比')
+    args = parser.parse_args()
+
+    mix = parse_weights(args.mix)
+    unknown = set(mix) - set(KINDS)
+    if unknown:
+        parser.error(f"未知的请求类型: {', '.join(unknown)}")
+    sizes = parse_weights(args.sizes, int)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    stub = None
+    base_url = args.url
+    if base_url is None:
+        base_url, stub = start_local_app(args)
+    if args.wait_ready and not wait_ready(base_url, args.wait_ready):
+        print("等待 /ready 超时，继续压测", file=sys.stderr)
+
+    print(f"压测 {base_url}: {args.rate} 请求/秒，持续 {args.duration} 秒 ...", file=sys.stderr)
+    load = LoadTest(base_url, sizes, mix, args.concurrency, args.seed)
+    elapsed = load.run(args.rate, args.duration)
+    report = load.report(elapsed)
+
+    result = {
+        'commit': git_commit(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'server': server_settings(base_url),
+        'ai_stub_calls': stub.calls if stub is not None else None,
+        'report': report
+    }
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
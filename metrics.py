@@ -0,0 +1,176 @@
+"""
+运行指标
+提供计数器、仪表和直方图，以Prometheus文本格式输出，供 /metrics 接口抓取。
+应用用到的指标都在本模块末尾定义。
+"""
+
+import threading
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    body = ','.join(f'{name}="{str(value)}"' for name, value in pairs)
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.label_names}")
+        return tuple(labels[name] for name in self.label_names)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+                for key, value in items]
+
+
+class Gauge(_Metric):
+    """
+    可增可减的仪表
+    也可以通过 set_function 提供一个在抓取时计算的函数，返回 {标签值元组: 数值}
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._function = None
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        self._function = function
+
+    def render(self):
+        if self._function is not None:
+            values = self._function()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+                for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """按桶统计的直方图"""
+
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            for k, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[k] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(self.label_names, key, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {counts[-1]}')
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self):
+        """输出Prometheus文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# ---------- 应用指标 ----------
+
+CACHE_DEPTH = Gauge('sudoku_cache_depth', '内存缓存中的数独数量', ['size'])
+BANK_DEPTH = Gauge('sudoku_bank_depth', '持久化题库中的数独数量', ['size'])
+PUZZLE_REQUESTS = Counter('sudoku_requests_total',
+                          '数独请求数，result为hit（命中）、waited（等待生成后取得）、pushed（通过事件流推送）、generating（生成中）或initializing（初始化中）',
+                          ['size', 'result'])
+GENERATION_SECONDS = Histogram('sudoku_generation_seconds', '单次数独生成耗时（秒）', ['size'])
+GENERATION_FAILURES = Counter('sudoku_generation_failures_total',
+                              '数独生成失败次数，reason为timeout、rejected（超过时间预算且线索过多）或error',
+                              ['size', 'reason'])
+GENERATION_OUTCOMES = Counter('sudoku_generation_outcomes_total',
+                              '数独生成结果，outcome为complete、partial（超过时间预算，保留了更多线索）、'
+                              'rejected、timeout或error', ['size', 'outcome'])
+PORTFOLIO_WINS = Counter('sudoku_portfolio_wins_total', '组合求解中最先完成的求解后端', ['size', 'backend'])
+GENERATION_IN_FLIGHT = Gauge('sudoku_generation_in_flight', '正在进行的生成任务数', ['size'])
+DUPLICATES = Counter('sudoku_duplicates_total',
+                     '因库存中已有同一类数独而跳过的次数，source为generated或refresh', ['size', 'source'])
+HINT_REQUESTS = Counter('sudoku_hint_requests_total', '提示请求数，source为local或ai', ['source'])
+HINT_UPSTREAM_SECONDS = Histogram('sudoku_hint_upstream_seconds', 'AI提示上游请求耗时（秒）')
+HINT_UPSTREAM_ERRORS = Counter('sudoku_hint_upstream_errors_total',
+                               'AI提示上游请求失败次数，reason为status、network或format', ['reason'])
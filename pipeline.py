@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+批量数独流水线
+在多个进程中批量生成、求解、验证数独，输入输出都是NDJSON（每行一个JSON对象）：
+- generate: 生成 count 个n阶数独，可同时写入持久化题库（离线补充库存）
+- solve: 求解输入的每道题目
+- verify: 验证输入的每道题目是否唯一解
+同时进行的任务数有上限（窗口），输入按需读取，内存占用不随数量增长；
+结果默认按输入顺序输出，--unordered 按完成顺序输出（每行带 index）。
+
+输入的每行可以是 {"puzzle": ...} 对象（puzzle 为规范字符串或 n×n 列表，其他字段如 id 原样带回）、
+JSON字符串，或不带引号的规范字符串。
+
+用法:
+    python test.py generate -n 9 --count 10000 --bank puzzle_bank.sqlite3 > puzzles.ndjson
+    python test.py solve --input pack.ndjson --jobs 8 --unordered
+    python test.py verify < pack.txt
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+COMMANDS = ('generate', 'solve', 'verify')
+BANK_FLUSH_SIZE = 200  # 写入题库时每批的数量
+
+
+def _init_worker():
+    # fork出的工作进程继承了同一个随机状态，需要重新播种，否则会生成相同的数独
+    random.seed()
+
+
+def _encoder(output_format):
+    from puzzle import Puzzle
+    return Puzzle.to_string if output_format == 'string' else Puzzle.to_grid
+
+
+def _parse_line(line):
+    """解析一行输入，返回 (题目, 需要原样带回的字段)"""
+    from puzzle import Puzzle
+    text = line.strip()
+    if text[:1] not in ('{', '"', '['):
+        return Puzzle.parse(text), {}
+    data = json.loads(text)
+    if isinstance(data, dict):
+        extra = {key: value for key, value in data.items() if key not in ('n', 'puzzle', 'solution')}
+        return Puzzle.parse(data.get('puzzle'), data.get('n')), extra
+    return Puzzle.parse(data), {}
+
+
+def generate_one(options, seed):
+    """生成一个数独（在工作进程中执行）"""
+    from test import generate_sudoku
+    from rating import rate_puzzle
+    from puzzle import Puzzle
+    from fingerprint import fingerprint
+
+    if seed is not None:
+        random.seed(seed)
+    n = options['n']
+    puzzle, solution = generate_sudoku(n, backend=options['backend'], mode=options['mode'],
+                                       target_clues=options['target_clues'],
+                                       time_budget=options['time_budget'])
+    compact = Puzzle.from_grid(puzzle)
+    encode = _encoder(options['format'])
+    return {'n': n, 'puzzle': encode(compact), 'solution': encode(Puzzle.from_grid(solution)),
+            'difficulty': rate_puzzle(puzzle)['difficulty'], 'fingerprint': fingerprint(compact)}
+
+
+def solve_one(options, line):
+    """求解一道题目（在工作进程中执行）"""
+    from solvers import get_backend
+    from puzzle import Puzzle
+
+    puzzle, extra = _parse_line(line)
+    encode = _encoder(options['format'])
+    record = dict(extra, n=puzzle.n, puzzle=encode(puzzle))
+    solution = get_backend(options['backend']).solve(puzzle.to_grid())
+    if solution is None:
+        record['error'] = '题目无解'
+    else:
+        record['solution'] = encode(Puzzle.from_grid(solution))
+    return record
+
+
+def verify_one(options, line):
+    """验证一道题目是否唯一解（在工作进程中执行）"""
+    from solvers import get_backend
+
+    puzzle, extra = _parse_line(line)
+    count = get_backend(options['backend']).count_solutions(puzzle.to_grid(), limit=2)
+    return dict(extra, n=puzzle.n, puzzle=_encoder(options['format'])(puzzle),
+                solutions=count, unique=count == 1)
+
+
+TASKS = {
+    'generate': generate_one,
+    'solve': solve_one,
+    'verify': verify_one,
+}
+
+
+def _run_chunk(command, options, chunk):
+    """在工作进程中处理一批任务，单个任务失败时记录错误并继续"""
+    task = TASKS[command]
+    results = []
+    for index, arg in chunk:
+        try:
+            record = task(options, arg)
+        except Exception as e:
+            record = {'error': str(e)}
+        results.append((index, record))
+    return results
+
+
+def _chunks(args, chunk_size):
+    """把 (序号, 参数) 按 chunk_size 分批，按需读取"""
+    chunk = []
+    for item in args:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(command, options, args, jobs=None, ordered=True, chunk_size=8, window=None):
+    """
+    在进程池中处理任务，产生 (序号, 结果)
+    :param args: 任务参数的可迭代对象，按需读取（可以是文件的行）
+    :param jobs: 进程数，默认为CPU核数
+    :param ordered: True按输入顺序产生结果，False按完成顺序
+    :param chunk_size: 每次交给工作进程的任务数，任务很快时减少进程间通信
+    :param window: 同时提交的批次上限，默认为进程数的4倍
+    """
+    jobs = jobs or os.cpu_count() or 1
+    window = window or jobs * 4
+    chunks = _chunks(enumerate(args), chunk_size)
+    with ProcessPoolExecutor(jobs, initializer=_init_worker) as executor:
+        pending = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < window:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                pending.append(executor.submit(_run_chunk, command, options, chunk))
+            if not pending:
+                return
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                yield from future.result()
+
+
+class BankWriter:
+    """把生成的数独分批写入持久化题库，同一类数独（指纹相同）只保留一份"""
+
+    def __init__(self, path):
+        from puzzle_bank import PuzzleBank
+        self.bank = PuzzleBank(path)
+        self.buffer = []
+        self.added = 0
+        self.skipped = 0
+
+    def add(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= BANK_FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        from puzzle import Puzzle
+        groups = {}
+        for record in self.buffer:
+            groups.setdefault((record['n'], record['difficulty']), []).append(record)
+        for (n, difficulty), records in groups.items():
+            items = [(Puzzle.parse(r['puzzle']), Puzzle.parse(r['solution'])) for r in records]
+            added = self.bank.add_many(n, items, difficulty=difficulty,
+                                       fingerprint=[r['fingerprint'] for r in records])
+            self.added += added
+            self.skipped += len(records) - added
+        self.buffer = []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批量生成、求解、验证数独（NDJSON）')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(sub):
+        sub.add_argument('--backend', default=None, help='求解后端: bitmask、z3 或 sat')
+        sub.add_argument('--output', default='-', help='输出文件，默认为标准输出')
+        sub.add_argument('--format', choices=['string', 'grid'], default='string',
+                         help='数独输出格式：规范字符串（默认）或 n×n 列表')
+        sub.add_argument('--jobs', type=int, default=None, help='进程数，默认为CPU核数')
+        sub.add_argument('--chunk-size', type=int, default=8, help='每次交给工作进程的任务数')
+        sub.add_argument('--unordered', action='store_true', help='按完成顺序输出，每行带 index')
+
+    generate = commands.add_parser('generate', help='生成数独')
+    generate.add_argument('-n', type=int, required=True, help='数独阶数')
+    generate.add_argument('--count', type=int, default=1, help='生成数量')
+    generate.add_argument('--mode', choices=['random', 'dig'], default='dig', help='挖空方式')
+    generate.add_argument('--target-clues', type=int, default=None, help="'dig' 模式的目标线索数量")
+    generate.add_argument('--time-budget', type=float, default=None, help='每个数独的时间预算（秒）')
+    generate.add_argument('--seed', type=int, default=None, help='随机种子，第i个数独使用 seed+i，结果可复现')
+    generate.add_argument('--bank', default=None, help='同时写入该持久化题库（SQLite文件）')
+    add_common(generate)
+
+    for name, description in (('solve', '求解题目'), ('verify', '验证题目是否唯一解')):
+        sub = commands.add_parser(name, help=description)
+        sub.add_argument('--input', default='-', help='输入文件（NDJSON或每行一个规范字符串），默认为标准输入')
+        add_common(sub)
+
+    args = parser.parse_args(argv)
+    options = {'backend': args.backend, 'format': args.format}
+    source = None
+    bank = None
+    if args.command == 'generate':
+        options.update(n=args.n, mode=args.mode, target_clues=args.target_clues, time_budget=args.time_budget)
+        tasks = (None if args.seed is None else args.seed + i for i in range(args.count))
+        if args.bank:
+            bank = BankWriter(args.bank)
+    else:
+        source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+        tasks = (line for line in source if line.strip())
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+
+    started = time.time()
+    total = failed = 0
+    try:
+        for index, record in run(args.command, options, tasks, jobs=args.jobs, ordered=not args.unordered,
+                                 chunk_size=args.chunk_size):
+            total += 1
+            if 'error' in record:
+                failed += 1
+            elif bank is not None:
+                bank.add(record)
+            if args.unordered or 'error' in record:
+                record = dict(record, index=index)
+            out.write(json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n')
+        if bank is not None:
+            bank.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if source is not None and source is not sys.stdin:
+            source.close()
+
+    summary = f"完成 {total} 个，失败 {failed} 个，耗时 {time.time() - started:.1f} 秒"
+    if bank is not None:
+        summary += f"，写入题库 {bank.added} 个，重复跳过 {bank.skipped} 个"
+    print(summary, file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
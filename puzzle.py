@@ -0,0 +1,126 @@
+"""
+紧凑的数独表示
+每个格子占一个字节（0表示空格），一道n阶题目就是一个长度为n×n的bytes对象，
+可以直接作为缓存条目、写入SQLite的BLOB列、在工作进程之间传递。
+需要文本时使用规范字符串：按行优先顺序每格一个字符，依次为 0-9、A-Z、a-z，
+9阶及以下与常见的81位数独字符串相同。
+"""
+
+import math
+
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+
+# 字节值 -> 字符，以及字符 -> 字节值的转换表（'.' 也表示空格，无效字符映射为255）
+_TO_TEXT = bytes(ALPHABET, 'ascii') + bytes(256 - len(ALPHABET))
+_FROM_TEXT = bytearray([255] * 256)
+for _value, _char in enumerate(ALPHABET):
+    _FROM_TEXT[ord(_char)] = _value
+_FROM_TEXT[ord('.')] = 0
+_FROM_TEXT = bytes(_FROM_TEXT)
+
+
+def _order_of(length):
+    n = math.isqrt(length)
+    box = math.isqrt(n)
+    if n * n != length or box * box != n or n == 0:
+        raise ValueError(f"无效的数独长度: {length}")
+    return n
+
+
+class Puzzle:
+    """
+    一道数独题目（或解）
+    :param cells: 长度为n×n的bytes，按行优先顺序，0表示空格
+    """
+
+    __slots__ = ('n', 'cells')
+
+    def __init__(self, cells):
+        self.cells = bytes(cells)
+        self.n = _order_of(len(self.cells))
+        if max(self.cells) > self.n:
+            raise ValueError(f"{self.n}阶数独中出现了超出范围的数字")
+
+    @classmethod
+    def from_grid(cls, grid):
+        """从 n×n 整数列表创建"""
+        return cls(bytes(cell for row in grid for cell in row))
+
+    @classmethod
+    def from_string(cls, text):
+        """从规范字符串创建"""
+        cells = text.encode('ascii', 'replace').translate(_FROM_TEXT)
+        if 255 in cells:
+            raise ValueError("数独字符串中包含无效字符")
+        return cls(cells)
+
+    @classmethod
+    def parse(cls, value, n=None):
+        """
+        解析客户端发送的题目：规范字符串或 n×n 列表（元素可以是数字或字符串）
+        :param n: 期望的阶数，不一致时抛出ValueError
+        """
+        if isinstance(value, cls):
+            puzzle = value
+        elif isinstance(value, str):
+            puzzle = cls.from_string(value)
+        elif isinstance(value, list):
+            try:
+                puzzle = cls.from_grid([[int(cell or 0) for cell in row] for row in value])
+            except TypeError:
+                raise ValueError("数独格式不正确")
+        else:
+            raise ValueError("数独格式不正确")
+        if n is not None and puzzle.n != n:
+            raise ValueError(f"数独阶数不一致: {puzzle.n} != {n}")
+        return puzzle
+
+    def to_grid(self):
+        """转换为 n×n 整数列表（渲染模板和调用求解器时使用）"""
+        n, cells = self.n, self.cells
+        return [list(cells[i * n:(i + 1) * n]) for i in range(n)]
+
+    def to_string(self):
+        """规范字符串"""
+        return self.cells.translate(_TO_TEXT).decode('ascii')
+
+    def is_solved(self):
+        """是否为填满且满足行、列、宫规则的解"""
+        n = self.n
+        if 0 in self.cells:
+            return False
+        box = math.isqrt(n)
+        full = set(range(1, n + 1))
+        grid = self.to_grid()
+        for k in range(n):
+            top, left = k // box * box, k % box * box
+            if (set(grid[k]) != full or {grid[r][k] for r in range(n)} != full or
+                    {grid[top + r][left + c] for r in range(box) for c in range(box)} != full):
+                return False
+        return True
+
+    def agrees_with(self, solution):
+        """题目的已知数字是否都与解一致"""
+        return self.n == solution.n and all(
+            v == 0 or v == s for v, s in zip(self.cells, solution.cells))
+
+    @property
+    def clues(self):
+        """已知数字的数量"""
+        return len(self.cells) - self.cells.count(0)
+
+    def __str__(self):
+        return self.to_string()
+
+    def __repr__(self):
+        return f'Puzzle({self.to_string()!r})'
+
+    def __eq__(self, other):
+        return isinstance(other, Puzzle) and self.cells == other.cells
+
+    def __hash__(self):
+        return hash(self.cells)
+
+    def __reduce__(self):
+        # 进程间传递时只序列化bytes
+        return (Puzzle, (self.cells,))
@@ -0,0 +1,189 @@
+"""
+持久化数独题库
+使用SQLite保存按阶数和难度分类的现成数独，支持多进程并发访问（如多个gunicorn工作进程），
+提供原子的领取（取出并删除）和批量写入，服务重启后库存依然保留。
+题目和解以 Puzzle 的字节形式存为BLOB，旧版本写入的JSON文本在读取时自动兼容。
+每道数独带有对称不变的指纹（fingerprint.py），同一类数独在库存中最多保留指定份数，
+所有生成过的指纹另外记录在 known 表中，用于快速确认客户端提交的数独是否由本服务生成。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from fingerprint import fingerprint as compute_fingerprint
+from puzzle import Puzzle
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS puzzles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    size INTEGER NOT NULL,
+    puzzle BLOB NOT NULL,
+    solution BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    difficulty TEXT,
+    fingerprint TEXT,
+    copy INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_puzzles_size ON puzzles (size, id);
+CREATE TABLE IF NOT EXISTS known (
+    size INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (size, fingerprint)
+) WITHOUT ROWID;
+"""
+
+# 旧版本数据库没有难度列和指纹列，启动时补上
+_MIGRATIONS = [
+    ('difficulty', 'ALTER TABLE puzzles ADD COLUMN difficulty TEXT'),
+    ('fingerprint', 'ALTER TABLE puzzles ADD COLUMN fingerprint TEXT'),
+    ('copy', 'ALTER TABLE puzzles ADD COLUMN copy INTEGER NOT NULL DEFAULT 0'),
+]
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_puzzles_difficulty ON puzzles (size, difficulty, id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_puzzles_fingerprint ON puzzles (size, fingerprint, copy);
+"""
+
+
+def _load(value):
+    """读取题目列：BLOB为 Puzzle 的字节，文本为旧版本的JSON"""
+    if isinstance(value, bytes):
+        return Puzzle(value)
+    return Puzzle.from_grid(json.loads(value))
+
+
+class PuzzleBank:
+    """
+    基于SQLite的数独题库
+    :param path: 数据库文件路径
+    :param timeout: 等待其他进程释放写锁的最长时间（秒）
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(puzzles)')}
+        for column, statement in _MIGRATIONS:
+            if column not in columns:
+                conn.execute(statement)
+        conn.executescript(_INDEXES)
+
+    def _conn(self):
+        """每个线程（以及fork出的每个进程）使用独立的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def add_many(self, size, items, difficulty=None, fingerprint=None, max_copies=1):
+        """
+        批量写入数独，同一类数独在库存中最多保留max_copies份，多出的跳过
+        :param items: [(题目, 解), ...]，题目和解为 Puzzle
+        :param difficulty: 这批数独的难度
+        :param fingerprint: 这批数独共同的指纹（同一个数独的对称变换），也可以是与items一一对应的指纹列表，
+                            None时逐个计算
+        :param max_copies: 每类数独最多保留的份数
+        :return: 写入的数量
+        """
+        if not items:
+            return 0
+        if fingerprint is None:
+            prints = [compute_fingerprint(puzzle) for puzzle, _ in items]
+        elif isinstance(fingerprint, list):
+            prints = fingerprint
+        else:
+            prints = [fingerprint] * len(items)
+
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = []
+            free = {}  # 指纹 -> 还可以使用的副本编号
+            for (puzzle, solution), fp in zip(items, prints):
+                if fp not in free:
+                    used = {row[0] for row in conn.execute(
+                        'SELECT copy FROM puzzles WHERE size = ? AND fingerprint = ?', (size, fp))}
+                    free[fp] = [k for k in range(max_copies) if k not in used]
+                if free[fp]:
+                    rows.append((size, puzzle.cells, solution.cells, now, difficulty, fp, free[fp].pop(0)))
+            conn.executemany(
+                'INSERT INTO puzzles (size, puzzle, solution, created_at, difficulty, fingerprint, copy) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.executemany('INSERT OR IGNORE INTO known (size, fingerprint, created_at) VALUES (?, ?, ?)',
+                             [(size, fp, now) for fp in free])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return len(rows)
+
+    def claim(self, size, limit=1, difficulty=None):
+        """
+        原子地领取最多limit个数独（取出后从题库删除）
+        :param difficulty: 只领取该难度的数独，None表示不限
+        :return: [{'puzzle': 题目, 'solution': 解, 'difficulty': 难度, 'fingerprint': 指纹}, ...]
+        """
+        if difficulty is None:
+            query = ('SELECT id, puzzle, solution, difficulty, fingerprint FROM puzzles WHERE size = ? '
+                     'ORDER BY id LIMIT ?', (size, limit))
+        else:
+            query = ('SELECT id, puzzle, solution, difficulty, fingerprint FROM puzzles '
+                     'WHERE size = ? AND difficulty = ? ORDER BY id LIMIT ?', (size, difficulty, limit))
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')  # 立即获取写锁，保证多个进程不会领取到同一个数独
+        try:
+            rows = conn.execute(*query).fetchall()
+            conn.executemany('DELETE FROM puzzles WHERE id = ?', [(row[0],) for row in rows])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return [{'puzzle': _load(puzzle), 'solution': _load(solution), 'difficulty': level,
+                 'fingerprint': fp}
+                for _, puzzle, solution, level, fp in rows]
+
+    def contains(self, size, fingerprint):
+        """库存中是否已有这一类数独"""
+        return self._conn().execute(
+            'SELECT 1 FROM puzzles WHERE size = ? AND fingerprint = ? LIMIT 1',
+            (size, fingerprint)).fetchone() is not None
+
+    def is_known(self, size, fingerprint):
+        """这一类数独是否曾经写入过题库（即由本服务生成）"""
+        return self._conn().execute(
+            'SELECT 1 FROM known WHERE size = ? AND fingerprint = ?',
+            (size, fingerprint)).fetchone() is not None
+
+    def count(self, size, difficulty=None):
+        """返回某个阶数（及难度）的库存数量"""
+        if difficulty is None:
+            return self._conn().execute(
+                'SELECT COUNT(*) FROM puzzles WHERE size = ?', (size,)).fetchone()[0]
+        return self._conn().execute(
+            'SELECT COUNT(*) FROM puzzles WHERE size = ? AND difficulty = ?',
+            (size, difficulty)).fetchone()[0]
+
+    def counts(self):
+        """返回各阶数的库存数量"""
+        return dict(self._conn().execute(
+            'SELECT size, COUNT(*) FROM puzzles GROUP BY size').fetchall())
+
+    def difficulty_counts(self, size):
+        """返回某个阶数各难度的库存数量"""
+        return dict(self._conn().execute(
+            'SELECT difficulty, COUNT(*) FROM puzzles WHERE size = ? GROUP BY difficulty',
+            (size,)).fetchall())
@@ -0,0 +1,170 @@
+"""
+单个阶数的内存数独缓存
+库存、种子数独和生成状态由同一把锁保护；取数独的请求可以在条件变量上等待
+正在进行的生成，新数独放入缓存或生成结束时唤醒等待的请求。
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class PuzzleCache:
+    """
+    一个阶数的数独缓存
+    条目为 {'puzzle': Puzzle, 'solution': Puzzle, 'difficulty': 难度, 'fingerprint': 指纹}
+    :param size: 数独阶数
+    :param capacity: 最多缓存的数独数量
+    :param seed_capacity: 保留的种子数独数量（真正求解生成的数独，用于对称变换派生新数独）
+    """
+
+    def __init__(self, size, capacity=3, seed_capacity=5):
+        self.size = size
+        self.capacity = capacity
+        self._entries = deque()
+        self._seeds = deque(maxlen=seed_capacity)
+        # 可重入锁：fill() 的回调中可以再读取缓存和种子
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self.generating = 0  # 正在进行的生成任务数
+        self.finished = 0  # 已结束的生成任务数（成功或失败）
+        self.initializing = False  # 是否正在预热
+        self.initialized = False  # 是否已完成预热
+        self.last_generation_time = 0  # 最后一次成功生成的时间
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def entries(self):
+        """当前缓存条目的副本"""
+        with self._lock:
+            return list(self._entries)
+
+    def seeds(self):
+        """当前种子数独的副本"""
+        with self._lock:
+            return list(self._seeds)
+
+    def fingerprints(self):
+        """缓存中各数独的指纹"""
+        with self._lock:
+            return {entry.get('fingerprint') for entry in self._entries}
+
+    def missing(self):
+        """距离补满还差的数量"""
+        with self._lock:
+            return max(0, self.capacity - len(self._entries))
+
+    def add(self, entry, evict=False):
+        """
+        放入一个数独
+        :param evict: 缓存已满时移除最旧的一个，False时缓存已满则不放入
+        :return: 是否放入
+        """
+        with self._lock:
+            if len(self._entries) >= self.capacity:
+                if not evict:
+                    return False
+                self._entries.popleft()
+            self._entries.append(entry)
+            self._changed.notify_all()
+            return True
+
+    def add_unique(self, entry):
+        """缓存未满且没有同一类数独（指纹相同）时放入，返回是否放入"""
+        with self._lock:
+            if entry.get('fingerprint') in self.fingerprints():
+                return False
+            return self.add(entry)
+
+    def extend(self, entries):
+        """放入多个数独，超出容量的部分丢弃，返回放入的数量"""
+        with self._lock:
+            entries = list(entries)[:self.missing()]
+            self._entries.extend(entries)
+            if entries:
+                self._changed.notify_all()
+            return len(entries)
+
+    def fill(self, produce):
+        """
+        补满缓存：在锁内计算缺少的数量并调用 produce(缺少的数量) 取得数独，
+        同一时刻只有一个补充在进行；produce 在锁内执行，只能是很快的内存操作（例如从种子派生），
+        可能等待其他进程的操作（例如领取题库）应在锁外进行，再用 extend() 放入
+        :return: 放入的数量
+        """
+        with self._lock:
+            missing = self.missing()
+            if missing <= 0:
+                return 0
+            return self.extend(produce(missing) or [])
+
+    def add_seed(self, seed):
+        """记录新种子，已有同一类种子时跳过，返回是否记录"""
+        with self._lock:
+            if any(known.get('fingerprint') == seed.get('fingerprint') for known in self._seeds):
+                return False
+            self._seeds.append(seed)
+            return True
+
+    def extend_seeds(self, seeds):
+        """批量记录种子（加载快照时使用）"""
+        with self._lock:
+            self._seeds.extend(seeds)
+
+    def _take(self, limit, difficulty):
+        taken = []
+        for entry in list(self._entries):
+            if len(taken) >= limit:
+                break
+            if difficulty is None or entry.get('difficulty') == difficulty:
+                self._entries.remove(entry)
+                taken.append(entry)
+        return taken
+
+    def take(self, limit, difficulty=None):
+        """
+        取出最多limit个数独
+        :param difficulty: 只取该难度的数独，None表示不限
+        """
+        with self._lock:
+            return self._take(limit, difficulty)
+
+    def wait_take(self, difficulty=None, timeout=0):
+        """
+        等待并取出一个数独：缓存为空时最多等待timeout秒，新数独放入时立即返回；
+        等待期间有生成结束、且没有其他进行中的生成时，仍没有合适的数独就提前放弃
+        :return: 数独条目，超时返回None
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            finished = self.finished
+            while True:
+                taken = self._take(1, difficulty)
+                if taken:
+                    return taken[0]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (self.finished > finished and not self.generating):
+                    return None
+                self._changed.wait(remaining)
+
+    def wait_change(self, timeout):
+        """等待缓存变化（放入数独或生成结束），最多timeout秒"""
+        with self._lock:
+            self._changed.wait(timeout)
+
+    def generation_started(self):
+        """记录开始一次生成"""
+        with self._lock:
+            self.generating += 1
+
+    def generation_finished(self, succeeded=True):
+        """记录生成结束（无论成功与否），唤醒等待的请求"""
+        with self._lock:
+            self.generating -= 1
+            self.finished += 1
+            if succeeded:
+                self.last_generation_time = time.time()
+            self._changed.notify_all()
+
@@ -0,0 +1,285 @@
+"""
+数独难度评级
+用人类解题技巧逐步求解题目，按用到的最难技巧给出难度：
+- easy: 唯一候选数（naked single）、唯一位置（hidden single）
+- medium: 数对（naked/hidden pair）、区块摒除（pointing / box-line）
+- hard: 鱼（X-Wing、Swordfish）
+- expert: 以上技巧都无法解出，需要试数
+"""
+
+from itertools import combinations
+
+DIFFICULTIES = ['easy', 'medium', 'hard', 'expert']
+
+DIFFICULTY_NAMES = {
+    'easy': '简单',
+    'medium': '中等',
+    'hard': '困难',
+    'expert': '专家'
+}
+
+# 技巧名称 -> (难度等级, 中文名称)
+TECHNIQUES = {
+    'naked_single': (0, '唯一候选数'),
+    'hidden_single': (0, '唯一位置'),
+    'pointing': (1, '区块摒除'),
+    'box_line': (1, '行列区块摒除'),
+    'naked_pair': (1, '显性数对'),
+    'hidden_pair': (1, '隐性数对'),
+    'x_wing': (2, 'X-Wing'),
+    'swordfish': (2, 'Swordfish'),
+}
+
+
+def _bits(mask):
+    """掩码中包含的数字（从1开始）"""
+    digits = []
+    d = 1
+    while mask:
+        if mask & 1:
+            digits.append(d)
+        mask >>= 1
+        d += 1
+    return digits
+
+
+def _popcount(x):
+    return bin(x).count('1')
+
+
+class LogicalSolver:
+    """
+    基于候选数的逻辑求解器
+    每次调用 step() 使用当前可用的最简单技巧推进一步
+    """
+
+    def __init__(self, grid):
+        n = len(grid)
+        box = int(n ** 0.5)
+        if box * box != n:
+            raise ValueError("n必须是完全平方数")
+        self.n = n
+        self.box = box
+        self.full = (1 << n) - 1
+        self.rows = [[r * n + c for c in range(n)] for r in range(n)]
+        self.cols = [[r * n + c for r in range(n)] for c in range(n)]
+        self.boxes = [[(b // box * box + k // box) * n + b % box * box + k % box for k in range(n)]
+                      for b in range(n)]
+        self.units = self.rows + self.cols + self.boxes
+        self.peers = [set() for _ in range(n * n)]
+        for unit in self.units:
+            for i in unit:
+                self.peers[i].update(unit)
+        for i in range(n * n):
+            self.peers[i].discard(i)
+
+        self.cells = [int(cell) for row in grid for cell in row]
+        self.cand = [0] * (n * n)
+        self.valid = True
+        for i, v in enumerate(self.cells):
+            if v and any(self.cells[p] == v for p in self.peers[i]):
+                self.valid = False
+        for i, v in enumerate(self.cells):
+            if not v:
+                used = 0
+                for p in self.peers[i]:
+                    if self.cells[p]:
+                        used |= 1 << (self.cells[p] - 1)
+                self.cand[i] = self.full & ~used
+                if not self.cand[i]:
+                    self.valid = False
+
+    def solved(self):
+        return all(self.cells)
+
+    def grid(self):
+        n = self.n
+        return [self.cells[r * n:(r + 1) * n] for r in range(n)]
+
+    def _place(self, i, v):
+        bit = 1 << (v - 1)
+        self.cells[i] = v
+        self.cand[i] = 0
+        for p in self.peers[i]:
+            self.cand[p] &= ~bit
+
+    def _eliminate(self, removals):
+        """执行候选数删除，removals为[(格子下标, 掩码)]，返回实际删除的[(行, 列, 数字)]"""
+        done = []
+        for i, mask in removals:
+            hit = self.cand[i] & mask
+            if hit:
+                self.cand[i] &= ~hit
+                done.extend((i // self.n, i % self.n, d) for d in _bits(hit))
+        return done
+
+    def _result(self, technique, placement=None, eliminations=None):
+        level, name = TECHNIQUES[technique]
+        step = {'technique': technique, 'name': name, 'level': level}
+        if placement:
+            i, v = placement
+            step['cell'] = (i // self.n, i % self.n)
+            step['value'] = v
+        if eliminations:
+            step['eliminations'] = eliminations
+        return step
+
+    # ---------- 技巧 ----------
+
+    def _naked_single(self):
+        for i, mask in enumerate(self.cand):
+            if mask and mask & (mask - 1) == 0:
+                v = mask.bit_length()
+                self._place(i, v)
+                return self._result('naked_single', (i, v))
+        return None
+
+    def _hidden_single(self):
+        for unit in self.units:
+            for v in range(1, self.n + 1):
+                bit = 1 << (v - 1)
+                spots = [i for i in unit if self.cand[i] & bit]
+                if len(spots) == 1:
+                    self._place(spots[0], v)
+                    return self._result('hidden_single', (spots[0], v))
+        return None
+
+    def _pointing(self):
+        """宫内某数字的候选格都在同一行（列）时，删除该行（列）宫外的该候选数"""
+        for box_cells in self.boxes:
+            for v in range(1, self.n + 1):
+                bit = 1 << (v - 1)
+                spots = [i for i in box_cells if self.cand[i] & bit]
+                if len(spots) < 2:
+                    continue
+                for lines, line_of in ((self.rows, lambda i: i // self.n), (self.cols, lambda i: i % self.n)):
+                    line = line_of(spots[0])
+                    if all(line_of(i) == line for i in spots):
+                        done = self._eliminate([(i, bit) for i in lines[line] if i not in box_cells])
+                        if done:
+                            return self._result('pointing', eliminations=done)
+        return None
+
+    def _box_line(self):
+        """行（列）内某数字的候选格都在同一宫时，删除该宫内其他格的该候选数"""
+        box = self.box
+        box_of = lambda i: (i // self.n) // box * box + (i % self.n) // box
+        for line in self.rows + self.cols:
+            for v in range(1, self.n + 1):
+                bit = 1 << (v - 1)
+                spots = [i for i in line if self.cand[i] & bit]
+                if len(spots) < 2:
+                    continue
+                b = box_of(spots[0])
+                if all(box_of(i) == b for i in spots):
+                    done = self._eliminate([(i, bit) for i in self.boxes[b] if i not in line])
+                    if done:
+                        return self._result('box_line', eliminations=done)
+        return None
+
+    def _naked_pair(self):
+        for unit in self.units:
+            pairs = {}
+            for i in unit:
+                if _popcount(self.cand[i]) == 2:
+                    pairs.setdefault(self.cand[i], []).append(i)
+            for mask, cells in pairs.items():
+                if len(cells) == 2:
+                    done = self._eliminate([(i, mask) for i in unit if i not in cells])
+                    if done:
+                        return self._result('naked_pair', eliminations=done)
+        return None
+
+    def _hidden_pair(self):
+        for unit in self.units:
+            spots = {}
+            for v in range(1, self.n + 1):
+                bit = 1 << (v - 1)
+                where = tuple(i for i in unit if self.cand[i] & bit)
+                if len(where) == 2:
+                    spots.setdefault(where, []).append(bit)
+            for cells, bits in spots.items():
+                if len(bits) == 2:
+                    keep = bits[0] | bits[1]
+                    done = self._eliminate([(i, self.full & ~keep) for i in cells])
+                    if done:
+                        return self._result('hidden_pair', eliminations=done)
+        return None
+
+    def _fish(self, size, technique):
+        """鱼：某数字在size行中的候选位置恰好覆盖size列时，删除这些列中其他行的该候选数（行列互换同理）"""
+        n = self.n
+        for v in range(1, n + 1):
+            bit = 1 << (v - 1)
+            for base, cover in ((self.rows, self.cols), (self.cols, self.rows)):
+                lines = []
+                for k, line in enumerate(base):
+                    positions = frozenset(j for j, i in enumerate(line) if self.cand[i] & bit)
+                    if 2 <= len(positions) <= size:
+                        lines.append((k, positions))
+                for group in combinations(lines, size):
+                    covered = frozenset().union(*(positions for _, positions in group))
+                    if len(covered) != size:
+                        continue
+                    chosen = {k for k, _ in group}
+                    removals = [(cover[j][k], bit) for j in covered for k in range(n) if k not in chosen]
+                    done = self._eliminate(removals)
+                    if done:
+                        return self._result(technique, eliminations=done)
+        return None
+
+    def step(self):
+        """
+        用最简单的可用技巧推进一步
+        :return: 步骤信息字典，没有可用技巧时返回None
+        """
+        if not self.valid:
+            return None
+        for technique in (self._naked_single, self._hidden_single, self._pointing,
+                          self._box_line, self._naked_pair, self._hidden_pair,
+                          lambda: self._fish(2, 'x_wing'), lambda: self._fish(3, 'swordfish')):
+            found = technique()
+            if found:
+                return found
+        return None
+
+    def next_placement(self):
+        """
+        推进直到确定一个格子的数字
+        :return: (确定数字的步骤, 之前所需的删除步骤列表)，找不到时返回 (None, 已执行的步骤)
+        """
+        steps = []
+        while not self.solved():
+            found = self.step()
+            if found is None:
+                return None, steps
+            if 'value' in found:
+                return found, steps
+            steps.append(found)
+        return None, steps
+
+
+def rate_puzzle(puzzle):
+    """
+    评估题目难度
+    :return: {'difficulty': 难度, 'score': 分数, 'techniques': {技巧: 使用次数}}
+    """
+    solver = LogicalSolver(puzzle)
+    used = {}
+    score = 0
+    while not solver.solved():
+        found = solver.step()
+        if found is None:
+            break
+        used[found['technique']] = used.get(found['technique'], 0) + 1
+        score += 1 + 10 * found['level']
+
+    if solver.solved():
+        level = max((TECHNIQUES[name][0] for name in used), default=0)
+    else:
+        level = 3
+    return {
+        'difficulty': DIFFICULTIES[level],
+        'score': score,
+        'techniques': used
+    }
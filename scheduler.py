@@ -0,0 +1,214 @@
+"""
+按需补充调度器
+统计每个阶数的请求速率和生成耗时，按高低水位线决定是否补充库存，
+优先补充最快耗尽的阶数，并限制同时进行的生成任务总数。
+"""
+
+import threading
+import time
+from collections import deque
+from queue import Queue, Empty
+
+# 生成任务的结果：前两种视为成功
+OUTCOMES = ('complete', 'partial', 'rejected', 'timeout', 'error')
+SUCCESS_OUTCOMES = ('complete', 'partial')
+
+
+class RefillScheduler:
+    """
+    数独库存补充调度器
+    :param sizes: 需要调度的阶数列表
+    :param run_job: 执行一次生成的函数 run_job(size)，返回 OUTCOMES 中的结果（也可以返回是否成功）
+    :param depth_of: 查询当前库存的函数 depth_of(size)
+    :param watermarks: {阶数: (低水位, 高水位)}，库存不高于低水位时开始补充，补到高水位为止
+    :param max_concurrent: 同时进行的生成任务上限
+    :param queue: 接收调度通知的队列，默认新建
+    :param rate_window: 统计请求速率的时间窗口（秒）
+    :param retry_delay: 生成失败后该阶数暂停调度的时间（秒），连续失败时逐次加倍
+    :param max_retry_delay: 暂停时间的上限（秒）
+    """
+
+    def __init__(self, sizes, run_job, depth_of, watermarks, max_concurrent=2,
+                 queue=None, rate_window=60, retry_delay=5, max_retry_delay=120):
+        self.sizes = list(sizes)
+        self.run_job = run_job
+        self.depth_of = depth_of
+        self.watermarks = dict(watermarks)
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.queue = queue if queue is not None else Queue()
+        self.rate_window = rate_window
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = set()  # 已通知、调度线程尚未处理的阶数
+        self._running = 0
+        self._stats = {
+            size: {
+                'requests': deque(),     # 窗口内的请求时间
+                'latency': None,         # 生成耗时的指数滑动平均（秒）
+                'in_flight': 0,          # 正在进行的生成任务数
+                'refilling': False,      # 是否处于补充状态（低水位触发，高水位结束）
+                'completed': 0,
+                'failed': 0,
+                'outcomes': dict.fromkeys(OUTCOMES, 0),
+                'consecutive_failures': 0,
+                'paused_until': 0
+            } for size in self.sizes
+        }
+
+    def start(self):
+        """启动调度线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+                self._thread.start()
+        return self
+
+    def record_request(self, size):
+        """记录一次数独请求，用于估计请求速率"""
+        if size not in self._stats:
+            return
+        now = time.time()
+        with self._lock:
+            requests = self._stats[size]['requests']
+            requests.append(now)
+            self._trim(requests, now)
+
+    def notify(self, size=None):
+        """
+        通知调度器某个阶数的库存发生了变化
+        同一个阶数在调度线程处理之前的重复通知会被合并，大量请求同时取空缓存时只触发一次调度
+        """
+        self.start()
+        with self._lock:
+            if size in self._pending:
+                return
+            self._pending.add(size)
+        self.queue.put(size)
+
+    def _trim(self, requests, now):
+        while requests and now - requests[0] > self.rate_window:
+            requests.popleft()
+
+    def _rate(self, size, now):
+        """每秒请求数"""
+        requests = self._stats[size]['requests']
+        self._trim(requests, now)
+        return len(requests) / self.rate_window
+
+    def _dispatch_loop(self):
+        while True:
+            try:
+                size = self.queue.get(timeout=1)
+                with self._lock:
+                    self._pending.discard(size)
+            except Empty:
+                pass  # 定期检查一次，防止漏掉通知
+            self._schedule()
+
+    def _schedule(self):
+        """在并发上限内为最紧迫的阶数启动生成任务"""
+        now = time.time()
+        # 查询库存可能要访问题库（SQLite），在锁外进行
+        depths = {size: self.depth_of(size) for size in self.sizes}
+        with self._lock:
+            while self._running < self.max_concurrent:
+                size = self._most_urgent(now, depths)
+                if size is None:
+                    break
+                self._running += 1
+                self._stats[size]['in_flight'] += 1
+                threading.Thread(target=self._run, args=(size,), daemon=True).start()
+
+    def _most_urgent(self, now, depths):
+        """
+        选出最需要补充的阶数
+        以“预计耗尽时间 - 生成耗时”衡量余量，余量最小的最优先；
+        没有请求时余量都是无穷大，依次按低于低水位的程度和生成耗时排序，生成快的小阶数先补充
+        :param depths: {阶数: 库存}
+        """
+        best, best_key = None, None
+        for size in self.sizes:
+            stats = self._stats[size]
+            low, high = self.watermarks[size]
+            if stats['paused_until'] > now:
+                continue
+            depth = depths[size] + stats['in_flight']
+            if depth <= low:
+                stats['refilling'] = True
+            elif depth >= high:
+                stats['refilling'] = False
+            if not stats['refilling']:
+                continue
+
+            rate = self._rate(size, now)
+            latency = stats['latency'] or 0
+            slack = (depth / rate if rate else float('inf')) - latency
+            key = (slack, depth - low, latency)
+            if best is None or key < best_key:
+                best, best_key = size, key
+        return best
+
+    def _run(self, size):
+        started = time.time()
+        outcome = 'error'
+        try:
+            outcome = self.run_job(size)
+        finally:
+            self._record_outcome(size, outcome, time.time() - started)
+            self.queue.put(size)
+
+    def _record_outcome(self, size, outcome, elapsed):
+        """
+        记录一次生成的结果
+        成功（包括超时后返回线索较多的题目）计入平均耗时；超时和放弃同样说明生成需要这么长时间，
+        也计入平均耗时，使调度器更早开始补充；失败后按连续失败次数加倍暂停该阶数
+        """
+        if outcome is True or outcome is False or outcome is None:
+            outcome = 'complete' if outcome else 'error'
+        with self._lock:
+            stats = self._stats[size]
+            stats['in_flight'] -= 1
+            self._running -= 1
+            stats['outcomes'][outcome] = stats['outcomes'].get(outcome, 0) + 1
+            if outcome != 'error':
+                previous = stats['latency']
+                stats['latency'] = elapsed if previous is None else 0.7 * previous + 0.3 * elapsed
+            if outcome in SUCCESS_OUTCOMES:
+                stats['completed'] += 1
+                stats['consecutive_failures'] = 0
+            else:
+                stats['failed'] += 1
+                stats['consecutive_failures'] += 1
+                delay = self.retry_delay * 2 ** (stats['consecutive_failures'] - 1)
+                stats['paused_until'] = time.time() + min(delay, self.max_retry_delay)
+
+    def state(self):
+        """返回调度器当前状态，便于查看"""
+        now = time.time()
+        depths = {size: self.depth_of(size) for size in self.sizes}
+        with self._lock:
+            sizes = {}
+            for size in self.sizes:
+                stats = self._stats[size]
+                low, high = self.watermarks[size]
+                sizes[size] = {
+                    'depth': depths[size],
+                    'low_watermark': low,
+                    'high_watermark': high,
+                    'request_rate': self._rate(size, now),
+                    'avg_latency': stats['latency'],
+                    'in_flight': stats['in_flight'],
+                    'refilling': stats['refilling'],
+                    'completed': stats['completed'],
+                    'failed': stats['failed'],
+                    'outcomes': dict(stats['outcomes']),
+                    'paused': stats['paused_until'] > now
+                }
+            return {
+                'running': self._running,
+                'max_concurrent': self.max_concurrent,
+                'sizes': sizes
+            }
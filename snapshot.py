@@ -0,0 +1,107 @@
+"""
+缓存快照
+把内存缓存和种子数独保存为JSON文件（数独用规范字符串），服务重启时先加载快照，
+几秒内就能提供数独，之后再在后台补充。
+- 写入时先写临时文件再替换，不会留下写了一半的快照
+- 加载时先把快照改名认领，多个工作进程同时启动时只有一个进程加载，避免同一批数独被重复发出
+- 多个工作进程各自保存到带进程号的快照文件（worker_path），不会互相覆盖；
+  启动时认领所有已退出进程留下的快照（snapshot_files）
+"""
+
+import glob
+import json
+import os
+
+SNAPSHOT_VERSION = 1
+
+
+def _dump(entries):
+    return [{
+        'puzzle': entry['puzzle'].to_string(),
+        'solution': entry['solution'].to_string(),
+        'difficulty': entry.get('difficulty'),
+        'fingerprint': entry.get('fingerprint')
+    } for entry in entries]
+
+
+def _load(records):
+    from puzzle import Puzzle
+    return [{
+        'puzzle': Puzzle.from_string(record['puzzle']),
+        'solution': Puzzle.from_string(record['solution']),
+        'difficulty': record.get('difficulty'),
+        'fingerprint': record.get('fingerprint')
+    } for record in records]
+
+
+def save_snapshot(path, cache, seeds):
+    """
+    保存快照
+    :param cache: {阶数: 缓存条目列表}
+    :param seeds: {阶数: 种子条目列表}
+    :return: 保存的数独数量
+    """
+    data = {
+        'version': SNAPSHOT_VERSION,
+        'cache': {str(size): _dump(entries) for size, entries in cache.items()},
+        'seeds': {str(size): _dump(entries) for size, entries in seeds.items()}
+    }
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return sum(len(entries) for entries in cache.values())
+
+
+def load_snapshot(path):
+    """
+    认领并加载快照
+    :return: (缓存, 种子)，格式与 save_snapshot 的参数相同；没有快照或快照已被其他进程认领时返回None
+    """
+    claimed = f'{path}.{os.getpid()}.loading'
+    try:
+        os.replace(path, claimed)
+    except FileNotFoundError:
+        return None
+    try:
+        with open(claimed, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"不支持的快照版本: {data.get('version')}")
+        cache = {int(size): _load(records) for size, records in data.get('cache', {}).items()}
+        seeds = {int(size): _load(records) for size, records in data.get('seeds', {}).items()}
+        return cache, seeds
+    finally:
+        os.remove(claimed)
+
+
+def worker_path(path):
+    """当前进程保存快照的路径：在配置的路径后加上进程号"""
+    return f'{path}.{os.getpid()}'
+
+
+def _alive(pid):
+    """进程是否仍在运行（Windows上无法安全检查，按已退出处理）"""
+    if pid == os.getpid() or os.name == 'nt':
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def snapshot_files(path):
+    """
+    可以认领的快照文件：配置的路径本身（旧版本或单进程保存的快照）和已退出进程留下的快照，
+    仍在运行的其他工作进程的快照不认领，避免同一批数独被两个进程发出
+    """
+    files = [path] if os.path.exists(path) else []
+    for name in glob.glob(glob.escape(path) + '.*'):
+        suffix = name[len(path) + 1:]
+        if suffix.isdigit() and not _alive(int(suffix)):
+            files.append(name)
+    return files
+
@@ -0,0 +1,638 @@
+"""
+数独求解后端
+提供统一的求解接口：生成随机完整解、枚举解（找到 limit 个即停止）、逐个挖空。
+- bitmask: 纯Python位掩码回溯搜索（最少候选数优先），不依赖z3
+- z3: 基于z3约束求解器，作为可选的备用后端
+- sat: 基于z3的一热布尔编码，交给SAT引擎求解，用于25阶及以上的大数独
+z3的两个后端在每个线程中使用自己的z3上下文，每个阶数的约束模型在每个线程中只构建一次，
+之后每次求解复用已构建的约束，因此可以在多个线程中同时生成，且不需要每次重新构建约束。
+"""
+
+import random
+import re
+import threading
+import time
+
+DEFAULT_BACKEND = 'bitmask'
+
+
+def box_size_of(n):
+    """返回n阶数独的宫格边长，n不是完全平方数时抛出ValueError"""
+    box = int(n ** 0.5)
+    if box * box != n:
+        raise ValueError("n必须是完全平方数")
+    return box
+
+
+def _popcount(x):
+    return bin(x).count('1')
+
+
+class SearchTimeout(Exception):
+    """求解超过截止时间"""
+
+
+class SolverBackend:
+    """求解后端接口"""
+
+    name = None
+
+    def full_grid(self, n, rng=None, deadline=None):
+        """
+        生成一个随机的n阶完整数独解
+        :param deadline: 截止时间（time.perf_counter()），超过后放弃；不支持的后端忽略该参数
+        :return: n×n 列表，无法生成（或超过截止时间）时返回None
+        """
+        raise NotImplementedError
+
+    def solutions(self, puzzle, limit=2, deadline=None):
+        """
+        枚举题目的解，找到 limit 个后立即停止
+        :param puzzle: n×n 列表，0表示空格
+        :param deadline: 截止时间（time.perf_counter()），超过后抛出SearchTimeout
+        :return: 解的列表（每个解为 n×n 列表）
+        """
+        raise NotImplementedError
+
+    def count_solutions(self, puzzle, limit=2, deadline=None):
+        """统计题目解的个数，最多数到 limit"""
+        return len(self.solutions(puzzle, limit, deadline))
+
+    def solve(self, puzzle, deadline=None):
+        """求出题目的一个解，无解时返回None"""
+        found = self.solutions(puzzle, limit=1, deadline=deadline)
+        return found[0] if found else None
+
+    def digger(self, solution):
+        """
+        创建逐个挖空的上下文：从完整解开始，每次尝试移除一个线索，
+        只有移除后仍然唯一解时才保留移除
+        """
+        raise NotImplementedError
+
+
+class Digger:
+    """挖空上下文接口"""
+
+    def __init__(self, solution):
+        self.n = len(solution)
+        self.solution = [row.copy() for row in solution]
+        self.puzzle = [row.copy() for row in solution]
+        self.clues = self.n * self.n
+
+    def try_remove(self, i, j, deadline=None):
+        """
+        尝试移除(i, j)处的线索，移除后仍唯一解则返回True并保留移除
+        :param deadline: 本次检查的截止时间（time.perf_counter()）
+        :return: True已移除，False移除后不唯一，None未能在截止时间前证明唯一（保留线索）
+        """
+        raise NotImplementedError
+
+    def statistics(self):
+        """求解器的统计信息（冲突次数、决策次数、内存等），不支持的后端返回空字典"""
+        return {}
+
+
+class BitmaskBackend(SolverBackend):
+    """纯Python位掩码回溯求解器"""
+
+    name = 'bitmask'
+
+    def full_grid(self, n, rng=None, deadline=None):
+        # 带唯一候选和隐性唯一剪枝的搜索生成完整解很快，不检查截止时间
+        box_size_of(n)
+        found = self._search(n, [0] * (n * n), 1, rng or random)
+        return self._to_grid(found[0], n) if found else None
+
+    def solutions(self, puzzle, limit=2, deadline=None):
+        n = len(puzzle)
+        box_size_of(n)
+        cells = [cell for row in puzzle for cell in row]
+        return [self._to_grid(found, n) for found in self._search(n, cells, limit, deadline=deadline)]
+
+    def digger(self, solution):
+        return BitmaskDigger(solution)
+
+    @staticmethod
+    def _to_grid(cells, n):
+        return [cells[i * n:(i + 1) * n] for i in range(n)]
+
+    @staticmethod
+    def _search(n, cells, limit, rng=None, forbid=None, deadline=None):
+        """
+        迭代式回溯搜索，每一步选择候选数最少的空格
+        :param cells: 长度为n*n的一维列表，会被就地修改
+        :param rng: 提供时按随机顺序尝试候选数字（用于生成完整解）
+        :param forbid: (格子下标, 数字) 搜索时该格子不允许填入该数字
+        :param deadline: 截止时间（time.perf_counter()），每搜索一批节点检查一次，超过后抛出SearchTimeout
+        :return: 解的列表（一维列表）
+        """
+        forbid_i, forbid_bit = (forbid[0], 1 << (forbid[1] - 1)) if forbid else (-1, 0)
+        box = box_size_of(n)
+        full = (1 << n) - 1
+        row_of = [i // n for i in range(n * n)]
+        col_of = [i % n for i in range(n * n)]
+        box_of = [(i // n) // box * box + (i % n) // box for i in range(n * n)]
+        units = ([[r * n + c for c in range(n)] for r in range(n)] +
+                 [[r * n + c for r in range(n)] for c in range(n)] +
+                 [[(b // box * box + k // box) * n + b % box * box + k % box for k in range(n)]
+                  for b in range(n)])
+        rows, cols, boxes = [0] * n, [0] * n, [0] * n
+        cand = [0] * (n * n)
+
+        empties = []
+        for i, v in enumerate(cells):
+            if not v:
+                empties.append(i)
+                continue
+            bit = 1 << (v - 1)
+            r, c, b = row_of[i], col_of[i], box_of[i]
+            if (rows[r] | cols[c] | boxes[b]) & bit:
+                return []  # 已知数字互相冲突，无解
+            rows[r] |= bit
+            cols[c] |= bit
+            boxes[b] |= bit
+
+        solutions = []
+        stack = []  # [格子下标, 尚未尝试的候选掩码]
+        total = len(empties)
+        steps = 0
+        while True:
+            steps += 1
+            if deadline is not None and not steps & 255 and time.perf_counter() > deadline:
+                raise SearchTimeout()
+            depth = len(stack)
+            if depth == total:
+                solutions.append(list(cells))
+                if len(solutions) >= limit:
+                    break
+            else:
+                # 选择候选数最少的空格
+                best_j, best_mask, best_count = depth, 0, n + 1
+                for j in range(depth, total):
+                    i = empties[j]
+                    mask = full & ~(rows[row_of[i]] | cols[col_of[i]] | boxes[box_of[i]])
+                    if i == forbid_i:
+                        mask &= ~forbid_bit
+                    cand[i] = mask
+                    count = _popcount(mask)
+                    if count < best_count:
+                        best_j, best_mask, best_count = j, mask, count
+                        if count <= 1:
+                            break
+                if best_count > 1:
+                    # 没有唯一候选格时检查各行列宫：某数字无处可放则剪枝，只有一处可放则直接填入
+                    best_j, best_mask = BitmaskBackend._hidden_single(
+                        units, cells, cand, empties, depth, best_j, best_mask, full)
+                if best_mask:
+                    empties[depth], empties[best_j] = empties[best_j], empties[depth]
+                    stack.append([empties[depth], best_mask])
+
+            # 回溯：撤销栈顶格子的当前取值并尝试下一个候选数
+            while stack:
+                entry = stack[-1]
+                i = entry[0]
+                r, c, b = row_of[i], col_of[i], box_of[i]
+                if cells[i]:
+                    bit = 1 << (cells[i] - 1)
+                    rows[r] ^= bit
+                    cols[c] ^= bit
+                    boxes[b] ^= bit
+                    cells[i] = 0
+                mask = entry[1]
+                if not mask:
+                    stack.pop()
+                    continue
+                if rng is None:
+                    bit = mask & -mask
+                else:
+                    bit = 1 << rng.choice([k for k in range(n) if mask >> k & 1])
+                entry[1] = mask ^ bit
+                cells[i] = bit.bit_length()
+                rows[r] |= bit
+                cols[c] |= bit
+                boxes[b] |= bit
+                break
+            else:
+                break  # 搜索空间已穷尽
+        return solutions
+
+    @staticmethod
+    def _hidden_single(units, cells, cand, empties, depth, best_j, best_mask, full):
+        """
+        在行、列、宫中查找只剩一个位置的数字
+        :return: (空格在empties中的位置, 候选掩码)，掩码为0表示当前分支无解
+        """
+        for unit in units:
+            once = twice = placed = 0
+            for i in unit:
+                v = cells[i]
+                if v:
+                    placed |= 1 << (v - 1)
+                else:
+                    m = cand[i]
+                    twice |= once & m
+                    once |= m
+            if full & ~(once | placed):
+                return best_j, 0
+            single = once & ~twice
+            if single:
+                bit = single & -single
+                for i in unit:
+                    if not cells[i] and cand[i] & bit:
+                        return empties.index(i, depth), bit
+        return best_j, best_mask
+
+
+class BitmaskDigger(Digger):
+    """
+    位掩码挖空上下文
+    移除一个线索后，只需搜索“该格填其他数字”的解是否存在，不存在即仍为唯一解
+    """
+
+    def __init__(self, solution):
+        super().__init__(solution)
+        self.cells = [cell for row in solution for cell in row]
+
+    def try_remove(self, i, j, deadline=None):
+        n = self.n
+        index = i * n + j
+        value = self.cells[index]
+        if not value:
+            return True
+        self.cells[index] = 0
+        try:
+            other = BitmaskBackend._search(n, list(self.cells), 1, forbid=(index, value), deadline=deadline)
+        except SearchTimeout:
+            self.cells[index] = value
+            return None
+        if other:
+            self.cells[index] = value
+            return False
+        self.puzzle[i][j] = 0
+        self.clues -= 1
+        return True
+
+
+# z3的默认超时（不限制）
+_NO_TIMEOUT = 4294967295
+
+
+def _set_deadline(solver, deadline):
+    """按截止时间设置z3求解器的超时，已经超时返回False；没有截止时间时取消超时"""
+    if deadline is None:
+        solver.set('timeout', _NO_TIMEOUT)
+        return True
+    remaining = deadline - time.perf_counter()
+    if remaining <= 0:
+        return False
+    solver.set('timeout', max(1, int(remaining * 1000)))
+    return True
+
+
+def _statistics(solver):
+    """z3求解器的统计信息字典"""
+    stats = solver.statistics()
+    return {key: stats.get_key_value(key) for key in stats.keys()}
+
+
+_local = threading.local()
+
+
+def _context(z3):
+    """当前线程的z3上下文：z3的上下文不能在线程间共享，每个线程使用自己的上下文"""
+    ctx = getattr(_local, 'context', None)
+    if ctx is None:
+        ctx = _local.context = z3.Context()
+    return ctx
+
+
+class CompiledModel:
+    """
+    编译好的n阶数独约束模型
+    基本约束只构建一次，之后每次求解都从只含基本约束的求解器克隆出新的求解器，
+    不需要重新构建约束表达式，各次求解互不影响
+    （在同一个求解器上反复 push/pop 会累积学习到的子句，大阶数的SAT求解器 push 本身也很慢）
+    :param base: 只含基本约束的求解器，本身不用于求解
+    :param variables: 求解需要的变量（z3后端为 n×n 的整数变量）
+    """
+
+    def __init__(self, base, variables=None):
+        self.base = base
+        self.variables = variables
+
+    def solver(self):
+        """克隆一个只含基本约束的求解器"""
+        return self.base.translate(self.base.ctx)
+
+
+class _CompiledBackend(SolverBackend):
+    """按线程、按阶数缓存编译好的约束模型的z3后端基类"""
+
+    def __init__(self):
+        import z3  # 缺少z3时抛出ImportError，由调用方处理
+        self.z3 = z3
+        self._local = threading.local()
+
+    @property
+    def ctx(self):
+        """当前线程的z3上下文"""
+        return _context(self.z3)
+
+    def model(self, n):
+        """当前线程的n阶约束模型，第一次使用时构建"""
+        models = getattr(self._local, 'models', None)
+        if models is None:
+            models = self._local.models = {}
+        if n not in models:
+            models[n] = self._compile(n)
+        return models[n]
+
+    def _compile(self, n):
+        """构建n阶约束模型，返回 CompiledModel"""
+        raise NotImplementedError
+
+
+def _check(solver, deadline, *assumptions):
+    """在截止时间内检查，超时（结果为unknown）时抛出SearchTimeout"""
+    import z3
+    if not _set_deadline(solver, deadline):
+        raise SearchTimeout()
+    result = solver.check(*assumptions)
+    if result == z3.unknown:
+        raise SearchTimeout()
+    return result
+
+
+class Z3Backend(_CompiledBackend):
+    """基于z3的求解后端（需要安装z3-solver）"""
+
+    name = 'z3'
+
+    def _compile(self, n):
+        """构建带有数独基本约束的求解器"""
+        z3 = self.z3
+        box = box_size_of(n)
+        solver = z3.Solver(ctx=self.ctx)
+        cells = [[z3.Int(f'cell_{i}_{j}', self.ctx) for j in range(n)] for i in range(n)]
+        for i in range(n):
+            for j in range(n):
+                # 每个单元格的值在1到n之间
+                solver.add(cells[i][j] >= 1, cells[i][j] <= n)
+            # 每行、每列数字不重复
+            solver.add(z3.Distinct(cells[i]))
+            solver.add(z3.Distinct([cells[j][i] for j in range(n)]))
+        # 每个小宫格数字不重复
+        for box_i in range(box):
+            for box_j in range(box):
+                solver.add(z3.Distinct([cells[i][j]
+                                        for i in range(box_i * box, (box_i + 1) * box)
+                                        for j in range(box_j * box, (box_j + 1) * box)]))
+        return CompiledModel(solver, cells)
+
+    def full_grid(self, n, rng=None, deadline=None):
+        compiled = self.model(n)
+        cells = compiled.variables
+        solver = compiled.solver()
+        if not _set_deadline(solver, deadline):
+            return None
+        # 随机固定第一行，使每次生成的解不同
+        first_row = list(range(1, n + 1))
+        (rng or random).shuffle(first_row)
+        for j, v in enumerate(first_row):
+            solver.add(cells[0][j] == v)
+        if solver.check() != self.z3.sat:
+            return None
+        model = solver.model()
+        return [[model.evaluate(cells[i][j]).as_long() for j in range(n)] for i in range(n)]
+
+    def solutions(self, puzzle, limit=2, deadline=None):
+        z3 = self.z3
+        n = len(puzzle)
+        compiled = self.model(n)
+        cells = compiled.variables
+        solver = compiled.solver()
+        for i in range(n):
+            for j in range(n):
+                if puzzle[i][j] != 0:
+                    solver.add(cells[i][j] == puzzle[i][j])
+
+        found = []
+        while len(found) < limit and _check(solver, deadline) == z3.sat:
+            model = solver.model()
+            grid = [[model.evaluate(cells[i][j], model_completion=True).as_long()
+                     for j in range(n)] for i in range(n)]
+            found.append(grid)
+            # 排除已找到的解，继续寻找下一个
+            solver.add(z3.Or([cells[i][j] != grid[i][j]
+                              for i in range(n) for j in range(n) if puzzle[i][j] == 0], self.ctx))
+        return found
+
+    def digger(self, solution):
+        return Z3Digger(self, solution)
+
+
+class Z3Digger(Digger):
+    """
+    z3挖空上下文
+    整个挖空过程复用同一个求解器（克隆自编译好的约束模型）：“不同于已知解”的约束只添加一次，
+    每个线索由一个布尔开关控制，检查时以保留的线索开关作为假设
+    """
+
+    def __init__(self, backend, solution):
+        super().__init__(solution)
+        z3 = backend.z3
+        self.z3 = z3
+        n = self.n
+        compiled = backend.model(n)
+        self.solver, cells = compiled.solver(), compiled.variables
+        self.keep = [[z3.Bool(f'keep_{i}_{j}', backend.ctx) for j in range(n)] for i in range(n)]
+        for i in range(n):
+            for j in range(n):
+                self.solver.add(z3.Implies(self.keep[i][j], cells[i][j] == solution[i][j]))
+        # 任何满足约束的模型都是另一个解
+        self.solver.add(z3.Or([cells[i][j] != solution[i][j] for i in range(n) for j in range(n)]))
+
+    def try_remove(self, i, j, deadline=None):
+        if not self.puzzle[i][j]:
+            return True
+        assumptions = [self.keep[r][c] for r in range(self.n) for c in range(self.n)
+                       if self.puzzle[r][c] and (r, c) != (i, j)]
+        try:
+            if _check(self.solver, deadline, *assumptions) != self.z3.unsat:
+                return False
+        except SearchTimeout:
+            return None
+        self.puzzle[i][j] = 0
+        self.clues -= 1
+        return True
+
+    def statistics(self):
+        return _statistics(self.solver)
+
+
+_TRUE_VAR = re.compile(r'\(define-fun x_(\d+)_(\d+)_(\d+) \(\) Bool\s+true\)')
+
+
+class SatBackend(_CompiledBackend):
+    """
+    一热布尔编码的SAT后端（需要安装z3-solver）
+    每个格子的每个数字对应一个布尔变量 x_行_列_数字，格子、行、列、宫中每个数字恰好出现一次，
+    全部是基数约束，由z3的有限域（SAT）引擎求解，规模远大于整数+Distinct编码能处理的范围。
+    约束以SMT-LIB文本一次性交给z3解析，比逐条调用Python API快得多，文本按阶数缓存。
+    """
+
+    name = 'sat'
+
+    def __init__(self):
+        super().__init__()
+        self._encodings = {}  # 阶数 -> SMT-LIB约束文本（各线程共用）
+
+    @staticmethod
+    def _name(i, j, v):
+        return f'x_{i}_{j}_{v}'
+
+    def var(self, i, j, v):
+        """(i, j) 格子填入数字 v 的布尔变量"""
+        return self.z3.Bool(self._name(i, j, v), self.ctx)
+
+    def _encoding(self, n):
+        text = self._encodings.get(n)
+        if text is None:
+            box = box_size_of(n)
+            name = self._name
+            lines = [f'(declare-const {name(i, j, v)} Bool)'
+                     for i in range(n) for j in range(n) for v in range(1, n + 1)]
+            ones = ' '.join(['1'] * n)
+
+            def exactly_one(names):
+                lines.append(f"(assert ((_ pbeq 1 {ones}) {' '.join(names)}))")
+
+            for i in range(n):
+                for j in range(n):
+                    exactly_one(name(i, j, v) for v in range(1, n + 1))
+            for v in range(1, n + 1):
+                for k in range(n):
+                    exactly_one(name(k, j, v) for j in range(n))
+                    exactly_one(name(i, k, v) for i in range(n))
+                    exactly_one(name(k // box * box + m // box, k % box * box + m % box, v)
+                                for m in range(n))
+            text = '\n'.join(lines)
+            self._encodings[n] = text
+        return text
+
+    def _compile(self, n):
+        """创建带有数独基本约束的求解器（每个线程每个阶数只解析一次）"""
+        solver = self.z3.SolverFor('QF_FD', ctx=self.ctx)
+        solver.from_string(self._encoding(n))
+        return CompiledModel(solver)
+
+    def _read_model(self, model, n):
+        """从模型中取出为真的变量，还原为 n×n 网格（解析模型文本比逐个访问变量快一个数量级）"""
+        grid = [[0] * n for _ in range(n)]
+        for i, j, v in _TRUE_VAR.findall(model.sexpr()):
+            grid[int(i)][int(j)] = int(v)
+        for i in range(n):
+            for j in range(n):
+                if not grid[i][j]:
+                    # 模型文本中缺少的变量（例如被预处理消去），逐个求值
+                    grid[i][j] = next(v for v in range(1, n + 1) if self.z3.is_true(
+                        model.evaluate(self.var(i, j, v), model_completion=True)))
+        return grid
+
+    def full_grid(self, n, rng=None, deadline=None):
+        rng = rng or random
+        box = box_size_of(n)
+        solver = self.model(n).solver()
+        if not _set_deadline(solver, deadline):
+            return None
+        # 预先填好第一个横向宫带和第一个纵向宫带：按随机数字排列的平移规律排布，
+        # 这部分总能补全为完整解，同时打破数字置换对称性，求解器只需填剩下的格子
+        digits = list(range(1, n + 1))
+        rng.shuffle(digits)
+        for i in range(n):
+            for j in range(n):
+                if i < box or j < box:
+                    solver.add(self.var(i, j, digits[(box * (i % box) + i // box + j) % n]))
+        solver.set('random_seed', rng.randrange(1 << 30))
+        if solver.check() != self.z3.sat:
+            return None
+        return self._read_model(solver.model(), n)
+
+    def solutions(self, puzzle, limit=2, deadline=None):
+        z3 = self.z3
+        n = len(puzzle)
+        solver = self.model(n).solver()
+        for i in range(n):
+            for j in range(n):
+                if puzzle[i][j] != 0:
+                    solver.add(self.var(i, j, puzzle[i][j]))
+
+        found = []
+        while len(found) < limit and _check(solver, deadline) == z3.sat:
+            grid = self._read_model(solver.model(), n)
+            found.append(grid)
+            # 排除已找到的解，继续寻找下一个
+            solver.add(z3.Or([z3.Not(self.var(i, j, grid[i][j]))
+                              for i in range(n) for j in range(n) if puzzle[i][j] == 0], self.ctx))
+        return found
+
+    def digger(self, solution):
+        return SatDigger(self, solution)
+
+
+class SatDigger(Digger):
+    """
+    SAT挖空上下文
+    与 Z3Digger 相同的思路，但一热编码下线索本身就是一个布尔变量，可以直接作为假设，
+    不需要额外的开关变量
+    """
+
+    def __init__(self, backend, solution):
+        super().__init__(solution)
+        z3 = backend.z3
+        self.z3 = z3
+        n = self.n
+        self.solver = backend.model(n).solver()
+        self.literals = [[backend.var(i, j, solution[i][j]) for j in range(n)] for i in range(n)]
+        # 任何满足约束的模型都是另一个解
+        self.solver.add(z3.Or([z3.Not(lit) for row in self.literals for lit in row]))
+
+    def try_remove(self, i, j, deadline=None):
+        if not self.puzzle[i][j]:
+            return True
+        assumptions = [self.literals[r][c] for r in range(self.n) for c in range(self.n)
+                       if self.puzzle[r][c] and (r, c) != (i, j)]
+        try:
+            if _check(self.solver, deadline, *assumptions) != self.z3.unsat:
+                return False
+        except SearchTimeout:
+            return None
+        self.puzzle[i][j] = 0
+        self.clues -= 1
+        return True
+
+    def statistics(self):
+        return _statistics(self.solver)
+
+
+BACKENDS = {
+    BitmaskBackend.name: BitmaskBackend,
+    Z3Backend.name: Z3Backend,
+    SatBackend.name: SatBackend,
+}
+
+_instances = {}
+
+
+def get_backend(name=None):
+    """
+    按名称获取求解后端实例
+    :param name: 后端名称，None表示默认后端
+    """
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"未知的求解后端: {name}，可选: {', '.join(BACKENDS)}")
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
@@ -1,14 +1,99 @@
-from z3 import *
 import sys
+import time
 import random
 import json
+from contextlib import nullcontext
+from solvers import SearchTimeout, get_backend
+from tracing import span
 
-def generate_sudoku(n, max_retries=10, retry_count=0):
+class BudgetExceeded(ValueError):
+    """超过时间预算，未能生成合格的题目"""
+
+def _record(stats, key, value):
+    """在统计字典中累加一项"""
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + value
+
+def remaining(deadline):
+    """截止时间前剩余的秒数，没有截止时间时返回None"""
+    return None if deadline is None else deadline - time.perf_counter()
+
+def default_target_clues(n):
+    """默认保留的线索数量，与随机挖空约60%的单元格一致"""
+    return n * n - int(n * n * 0.6)
+
+def dig_puzzle(engine, solution, target_clues=None, stats=None, deadline=None, progress=None,
+               check_timeout=None, trace=None):
+    """
+    逐个挖空生成题目：按随机顺序尝试移除每个线索，只有移除后仍唯一解时才保留移除，
+    整个过程复用同一个求解上下文，每个格子只检查一次
+    :param engine: 求解后端
+    :param solution: 完整解
+    :param target_clues: 目标线索数量，达到后停止挖空；也可以是 (最少, 最多) 范围，每次随机取值
+    :param stats: 可选的统计字典，另外记录本次的目标线索数（target_clues）
+    :param deadline: 截止时间（time.perf_counter()），到达后停止挖空，返回线索较多但仍唯一解的题目
+    :param progress: 可选的进度回调 progress(阶段, 已完成, 总数)
+    :param check_timeout: 单次唯一解检查的时间上限（秒），超过时放弃移除该线索，继续尝试下一个格子
+    :param trace: 可选的 tracing.Trace，记录构建约束、首次检查和挖空的耗时以及求解器统计
+    :return: 题目
+    """
+    n = len(solution)
+    if target_clues is None:
+        target_clues = default_target_clues(n)
+    elif isinstance(target_clues, (list, tuple)):
+        target_clues = random.randint(*target_clues)
+    if stats is not None:
+        stats['target_clues'] = target_clues
+    
+    started = time.perf_counter()
+    with span(trace, 'build'):
+        digger = engine.digger(solution)
+    positions = list(range(n*n))
+    random.shuffle(positions)
+    with span(trace, 'dig') as record:
+        for checked, pos in enumerate(positions):
+            if digger.clues <= target_clues:
+                break
+            if deadline is not None and time.perf_counter() > deadline:
+                _record(stats, 'deadline_hits', 1)
+                break
+            if progress is not None and checked % n == 0:
+                progress('dig', checked, len(positions))
+            check_deadline = deadline
+            if check_timeout is not None:
+                check_deadline = min(deadline or float('inf'), time.perf_counter() + check_timeout)
+            # 第一次检查包含求解器的初始化（z3的预处理等），单独记录
+            with span(trace, 'first_check') if checked == 0 else nullcontext():
+                removed = digger.try_remove(*divmod(pos, n), deadline=check_deadline)
+            if removed is None:
+                _record(stats, 'check_timeouts', 1)
+            _record(stats, 'checks', 1)
+        record['clues'] = digger.clues
+    _record(stats, 'unique_time', time.perf_counter() - started)
+    if trace is not None:
+        trace.solver = digger.statistics()
+    return digger.puzzle
+
+def generate_sudoku(n, max_retries=10, retry_count=0, backend=None, mode='random', target_clues=None,
+                    stats=None, time_budget=None, progress=None, check_timeout=None, max_clues=None,
+                    trace=None):
     """
     生成n阶唯一解数独及其解
     :param n: 数独阶数，必须是完全平方数
     :param max_retries: 最大重试次数
     :param retry_count: 当前重试次数
+    :param backend: 求解后端名称（'bitmask'、'z3' 或 'sat'），默认使用 bitmask
+    :param mode: 挖空方式，'random' 随机挖空约60%后补回线索，'dig' 逐个挖空
+    :param target_clues: 'dig' 模式下的目标线索数量，默认保留约40%
+    :param stats: 可选字典，记录生成完整解耗时(full_grid_time)、唯一解验证耗时(unique_time)、
+                  唯一解检查次数(checks)、重试次数(retries)、超时的检查次数(check_timeouts)，
+                  以及结果(outcome)：'complete' 达到目标线索数（或无法再挖空），'partial' 因超时未达到目标线索数
+    :param time_budget: 时间预算（秒）。'dig' 模式下超过预算时停止挖空，返回线索较多的题目；
+                        生成完整解或 'random' 模式超过预算时抛出BudgetExceeded
+    :param progress: 可选的进度回调 progress(阶段, 已完成, 总数)，阶段为 'full_grid' 或 'dig'
+    :param check_timeout: 'dig' 模式下单次唯一解检查的时间上限（秒）
+    :param max_clues: 'dig' 模式下因超时保留的线索超过该数量时抛出BudgetExceeded，由调用方改用库存
+    :param trace: 可选的 tracing.Trace，按阶段（full_grid、build、first_check、dig、unique_check）记录耗时
     :return: (题目, 解)
     """
     try:
@@ -21,40 +106,53 @@ def generate_sudoku(n, max_retries=10, retry_count=0):
         if retry_count >= max_retries:
             raise ValueError("达到最大重试次数，无法生成唯一解数独")
         
-        # 创建z3求解器
-        solver = Solver()
-        
-        # 创建n×n的整数变量矩阵
-        cells = [[Int(f'cell_{i}_{j}') for j in range(n)] for i in range(n)]
+        engine = get_backend(backend)
+        deadline = time.perf_counter() + time_budget if time_budget else None
         
-        # 添加基本约束
-        for i in range(n):
-            for j in range(n):
-                # 每个单元格的值在1到n之间
-                solver.add(cells[i][j] >= 1, cells[i][j] <= n)
-            
-            # 每行数字不重复
-            solver.add(Distinct(cells[i]))
-            
-            # 每列数字不重复
-            solver.add(Distinct([cells[j][i] for j in range(n)]))
-        
-        # 每个小宫格数字不重复
-        box_size = int(n ** 0.5)
-        for box_i in range(box_size):
-            for box_j in range(box_size):
-                box_cells = []
-                for i in range(box_i*box_size, (box_i+1)*box_size):
-                    for j in range(box_j*box_size, (box_j+1)*box_size):
-                        box_cells.append(cells[i][j])
-                solver.add(Distinct(box_cells))
+        if mode == 'dig':
+            # 逐个挖空不需要重试整个过程，只在无法生成完整解时重新生成
+            for attempt in range(max_retries - retry_count):
+                _record(stats, 'retries', 1 if attempt else 0)
+                if progress is not None:
+                    progress('full_grid', 0, 1)
+                started = time.perf_counter()
+                with span(trace, 'full_grid', attempt=attempt):
+                    solution = engine.full_grid(n, deadline=deadline)
+                _record(stats, 'full_grid_time', time.perf_counter() - started)
+                if solution is not None:
+                    if progress is not None:
+                        progress('full_grid', 1, 1)
+                    dig_stats = {}
+                    puzzle = dig_puzzle(engine, solution, target_clues, dig_stats, deadline, progress,
+                                        check_timeout, trace)
+                    for key, value in dig_stats.items():
+                        _record(stats, key, value)
+                    clues = sum(1 for row in puzzle for cell in row if cell)
+                    # 超时的检查只有在最终没有达到目标线索数时才算保留了多余的线索
+                    partial = dig_stats.get('deadline_hits') or (
+                        dig_stats.get('check_timeouts') and clues > dig_stats['target_clues'])
+                    if partial and max_clues is not None and clues > max_clues:
+                        raise BudgetExceeded(f"超过时间预算，题目保留了 {clues} 个线索（上限 {max_clues}）")
+                    if stats is not None:
+                        stats['outcome'] = 'partial' if partial else 'complete'
+                    return puzzle, solution
+                if deadline is not None and time.perf_counter() > deadline:
+                    raise BudgetExceeded(f"超过时间预算 {time_budget} 秒，未能生成完整解")
+            raise ValueError("达到最大重试次数，无法生成唯一解数独")
+        if mode != 'random':
+            raise ValueError(f"未知的挖空方式: {mode}")
         
         # 求解完整数独
-        if solver.check() != sat:
-            raise ValueError("无法生成数独")
-        
-        model = solver.model()
-        solution = [[model.evaluate(cells[i][j]).as_long() for j in range(n)] for i in range(n)]
+        _record(stats, 'retries', 1 if retry_count else 0)
+        started = time.perf_counter()
+        with span(trace, 'full_grid', attempt=retry_count):
+            solution = engine.full_grid(n, deadline=deadline)
+        _record(stats, 'full_grid_time', time.perf_counter() - started)
+        if solution is None:
+            if deadline is not None and time.perf_counter() > deadline:
+                raise BudgetExceeded(f"超过时间预算 {time_budget} 秒，未能生成完整解")
+            return generate_sudoku(n, max_retries, retry_count + 1, backend, mode, target_clues, stats,
+                                   remaining(deadline), progress, trace=trace)  # 递归重试
         
         # 随机挖空部分单元格生成题目
         puzzle = [row.copy() for row in solution]
@@ -63,40 +161,58 @@ def generate_sudoku(n, max_retries=10, retry_count=0):
             i, j = divmod(pos, n)
             puzzle[i][j] = 0
         
-        # 验证题目是否有唯一解
-        temp_solver = Solver()
-        # 添加题目已知数字的约束
-        for i in range(n):
-            for j in range(n):
-                if puzzle[i][j] != 0:
-                    temp_solver.add(cells[i][j] == puzzle[i][j])
-        
-        # 检查是否有解
-        if temp_solver.check() != sat:
-            return generate_sudoku(n, max_retries, retry_count + 1)  # 递归重试
-        
-        # 检查是否唯一解
-        temp_model = temp_solver.model()
-        temp_solver.add(Or([cells[i][j] != temp_model.evaluate(cells[i][j]) 
-                          for i in range(n) for j in range(n) if puzzle[i][j] == 0]))
-        if temp_solver.check() == sat:
-            return generate_sudoku(n, max_retries, retry_count + 1)  # 不唯一解，递归重试
+        # 验证题目是否有唯一解：最多找两个解，
+        # 找到第二个解时在两个解不同的位置补回一个数字，直到解唯一
+        while True:
+            if deadline is not None and time.perf_counter() > deadline:
+                raise BudgetExceeded(f"超过时间预算 {time_budget} 秒，未能生成唯一解数独")
+            started = time.perf_counter()
+            try:
+                with span(trace, 'unique_check', attempt=retry_count):
+                    found = engine.solutions(puzzle, limit=2, deadline=deadline)
+            except SearchTimeout:
+                raise BudgetExceeded(f"超过时间预算 {time_budget} 秒，未能生成唯一解数独")
+            _record(stats, 'unique_time', time.perf_counter() - started)
+            _record(stats, 'checks', 1)
+            if not found:
+                return generate_sudoku(n, max_retries, retry_count + 1, backend, mode, target_clues, stats,
+                                       remaining(deadline), progress, trace=trace)  # 递归重试
+            if len(found) == 1:
+                break
+            other = found[0] if found[0] != solution else found[1]
+            diff = [(i, j) for i in range(n) for j in range(n) if other[i][j] != solution[i][j]]
+            i, j = random.choice(diff)
+            puzzle[i][j] = solution[i][j]
         
+        if stats is not None:
+            stats['outcome'] = 'complete'
         # 返回生成的数独题目和解
         return puzzle, solution
         
-    except ImportError:
-        print(json.dumps({"error": "未安装z3-solver库，请先运行 'pip install z3-solver'"}))
-        sys.exit(1)
+    except ImportError as e:
+        # 由调用方处理：命令行输出错误后退出，工作进程（线程）返回错误结果
+        raise ImportError("未安装z3-solver库，请先运行 'pip install z3-solver'") from e
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print(json.dumps({"error": "用法: python test.py n", "example": "python test.py 9"}))
+    # 批量模式：python test.py generate|solve|verify ...（见 pipeline.py）
+    if len(sys.argv) > 1 and sys.argv[1] in ("generate", "solve", "verify"):
+        from pipeline import main
+        sys.exit(main(sys.argv[1:]))
+    
+    if len(sys.argv) not in (2, 3):
+        print(json.dumps({"error": "用法: python test.py n [backend] 或 python test.py generate|solve|verify ...",
+                          "example": "python test.py 9 bitmask"}))
         sys.exit(1)
     
     try:
         n = int(sys.argv[1])
-        puzzle, solution = generate_sudoku(n)
+        backend = sys.argv[2] if len(sys.argv) == 3 else None
+        
+        def report(stage, done, total):
+            print(f"{stage}: {done}/{total}", file=sys.stderr, flush=True)
+        
+        # 大数独生成耗时较长，在标准错误输出进度
+        puzzle, solution = generate_sudoku(n, backend=backend, progress=report if n > 16 else None)
         
         result = {
             "n": n,
@@ -105,6 +221,6 @@ if __name__ == "__main__":
         }
         print(json.dumps(result))
         
-    except ValueError as e:
+    except (ValueError, ImportError) as e:
         print(json.dumps({"error": str(e)}))
         sys.exit(1)
@@ -0,0 +1,45 @@
+"""应用层库存的回归测试：缓存、种子和题库之间不会重复发出同一道题目"""
+
+import pytest
+
+import app
+from fingerprint import fingerprint
+from puzzle import Puzzle
+from puzzle_bank import PuzzleBank
+from puzzle_cache import PuzzleCache
+from test import generate_sudoku
+
+
+class _Pool:
+    """总是返回同一个生成结果的生成池"""
+
+    def __init__(self, result):
+        self.result = result
+
+    def generate(self, size, **options):
+        return dict(self.result)
+
+
+@pytest.fixture
+def inventory(tmp_path, monkeypatch):
+    bank = PuzzleBank(str(tmp_path / 'bank.sqlite3'))
+    cache = PuzzleCache(4, capacity=3)
+    monkeypatch.setattr(app, 'puzzle_bank', bank)
+    monkeypatch.setattr(app, 'BANK_COPIES_PER_CLASS', 3)
+    monkeypatch.setitem(app.puzzle_caches, 4, cache)
+    return cache, bank
+
+
+def test_new_seed_is_not_served_from_both_cache_and_bank(inventory, monkeypatch):
+    cache, bank = inventory
+    grid, solution = generate_sudoku(4)
+    seed = Puzzle.from_grid(grid)
+    monkeypatch.setattr(app, 'get_generator_pool', lambda: _Pool({
+        'puzzle': seed, 'solution': Puzzle.from_grid(solution), 'difficulty': 'easy',
+        'fingerprint': fingerprint(seed), 'outcome': 'complete'}))
+
+    assert app.generate_sudoku_background(4) == 'complete'
+
+    served = [entry['puzzle'] for entry in cache.take(100)] + [entry['puzzle'] for entry in bank.claim(4, 100)]
+    assert served.count(seed) == 1
+    assert bank.is_known(4, fingerprint(seed))
@@ -0,0 +1,33 @@
+"""数独指纹：对称变换不改变指纹，不同的数独指纹不同"""
+
+import random
+
+from fingerprint import canonical_form, fingerprint
+from puzzle import Puzzle
+from transform import transform_pair
+
+PUZZLE = Puzzle.from_string(
+    '530070000600195000098000060800060003400803001700020006060000280000419005000080079')
+SOLUTION = Puzzle.from_string(
+    '534678912672195348198342567859761423426853791713924856961537284287419635345286179')
+
+
+def test_fingerprint_is_invariant_under_transforms():
+    expected = fingerprint(PUZZLE)
+    rng = random.Random(0)
+    for _ in range(10):
+        puzzle, _ = transform_pair(PUZZLE, SOLUTION, rng)
+        assert fingerprint(puzzle) == expected
+
+
+def test_canonical_form_is_a_transform_of_the_puzzle():
+    canonical = canonical_form(PUZZLE)
+    assert canonical.clues == PUZZLE.clues
+    assert fingerprint(canonical) == fingerprint(PUZZLE)
+
+
+def test_different_puzzles_have_different_fingerprints():
+    # 去掉一个线索后（不再唯一解）是另一道题
+    other = Puzzle(PUZZLE.cells[:20] + b'\x00' + PUZZLE.cells[21:])
+    assert fingerprint(other) != fingerprint(PUZZLE)
+    assert fingerprint(SOLUTION) != fingerprint(PUZZLE)
@@ -0,0 +1,83 @@
+"""持久化题库：领取是原子的，同一个数独不会被领取两次；同一类数独最多保留指定份数"""
+
+import random
+import threading
+
+from fingerprint import fingerprint
+from puzzle import Puzzle
+from puzzle_bank import PuzzleBank
+from transform import derive_puzzles
+
+PUZZLE = Puzzle.from_string(
+    '530070000600195000098000060800060003400803001700020006060000280000419005000080079')
+SOLUTION = Puzzle.from_string(
+    '534678912672195348198342567859761423426853791713924856961537284287419635345286179')
+FINGERPRINT = fingerprint(PUZZLE)
+
+
+def make_items(count, seed=0):
+    # 派生的数独与种子是同一类，写入时传入种子的指纹，并允许足够的副本
+    return derive_puzzles(PUZZLE, SOLUTION, count, random.Random(seed))
+
+
+def test_claim_removes_puzzles_from_the_bank(tmp_path):
+    bank = PuzzleBank(str(tmp_path / 'bank.sqlite3'))
+    items = make_items(5)
+    assert bank.add_many(9, items, difficulty='hard', fingerprint=FINGERPRINT, max_copies=5) == 5
+    assert bank.count(9) == 5
+
+    claimed = bank.claim(9, limit=2)
+    assert [(entry['puzzle'], entry['solution']) for entry in claimed] == items[:2]
+    assert claimed[0]['difficulty'] == 'hard'
+    assert bank.count(9) == 3
+    assert bank.claim(9, limit=1, difficulty='easy') == []
+    assert bank.claim(4) == []
+
+
+def test_concurrent_claims_never_return_the_same_puzzle(tmp_path):
+    path = str(tmp_path / 'bank.sqlite3')
+    PuzzleBank(path).add_many(9, make_items(40), fingerprint=FINGERPRINT, max_copies=40)
+    claimed, errors = [], []
+
+    def worker():
+        bank = PuzzleBank(path)  # 每个线程像独立的工作进程一样打开自己的题库
+        try:
+            while True:
+                taken = bank.claim(9, limit=3)
+                if not taken:
+                    break
+                claimed.extend(entry['puzzle'].cells for entry in taken)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(claimed) == 40
+    assert len(set(claimed)) == 40
+    assert PuzzleBank(path).count(9) == 0
+
+
+def test_each_class_keeps_at_most_max_copies(tmp_path):
+    bank = PuzzleBank(str(tmp_path / 'bank.sqlite3'))
+    assert bank.add_many(9, make_items(5), fingerprint=FINGERPRINT, max_copies=2) == 2
+    assert bank.add_many(9, make_items(5, seed=1), fingerprint=FINGERPRINT, max_copies=2) == 0
+    assert bank.contains(9, FINGERPRINT)
+
+    # 领取后释放副本编号，可以再写入
+    bank.claim(9)
+    assert bank.add_many(9, make_items(5, seed=2), fingerprint=FINGERPRINT, max_copies=2) == 1
+    assert bank.count(9) == 2
+
+
+def test_known_fingerprints_outlive_the_stock(tmp_path):
+    bank = PuzzleBank(str(tmp_path / 'bank.sqlite3'))
+    bank.add_many(9, [(PUZZLE, SOLUTION)])  # 未传入指纹时逐个计算
+    assert bank.claim(9, limit=5)[0]['fingerprint'] == FINGERPRINT
+    assert not bank.contains(9, FINGERPRINT)
+    assert bank.is_known(9, FINGERPRINT)
+    assert not bank.is_known(16, FINGERPRINT)
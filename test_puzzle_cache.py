@@ -0,0 +1,57 @@
+"""内存缓存：wait_take 的超时、被新数独唤醒和生成失败时提前放弃"""
+
+import threading
+import time
+
+from puzzle_cache import PuzzleCache
+
+
+def entry(name, difficulty='medium'):
+    return {'puzzle': name, 'solution': name, 'difficulty': difficulty, 'fingerprint': name}
+
+
+def later(delay, action):
+    timer = threading.Timer(delay, action)
+    timer.start()
+    return timer
+
+
+def test_wait_take_returns_a_cached_puzzle_immediately():
+    cache = PuzzleCache(9)
+    cache.add(entry('a'))
+    assert cache.wait_take(timeout=5)['puzzle'] == 'a'
+    assert len(cache) == 0
+
+
+def test_wait_take_times_out_when_nothing_arrives():
+    cache = PuzzleCache(9)
+    start = time.monotonic()
+    assert cache.wait_take(timeout=0.2) is None
+    assert 0.2 <= time.monotonic() - start < 1
+
+
+def test_wait_take_wakes_up_when_a_puzzle_is_added():
+    cache = PuzzleCache(9)
+    later(0.1, lambda: cache.add(entry('a')))
+    start = time.monotonic()
+    assert cache.wait_take(timeout=5)['puzzle'] == 'a'
+    assert time.monotonic() - start < 2
+
+
+def test_wait_take_skips_other_difficulties():
+    cache = PuzzleCache(9)
+    later(0.05, lambda: cache.add(entry('a', 'easy')))
+    later(0.15, lambda: cache.add(entry('b', 'hard')))
+    assert cache.wait_take('hard', timeout=5)['puzzle'] == 'b'
+    assert [e['puzzle'] for e in cache.entries()] == ['a']
+
+
+def test_wait_take_gives_up_when_the_last_generation_fails():
+    cache = PuzzleCache(9)
+    cache.generation_started()
+    cache.generation_started()
+    later(0.1, lambda: cache.generation_finished(succeeded=False))
+    later(0.2, lambda: cache.generation_finished(succeeded=False))
+    start = time.monotonic()
+    assert cache.wait_take(timeout=5) is None
+    assert 0.15 <= time.monotonic() - start < 2  # 第一个生成结束时还有进行中的生成，继续等待
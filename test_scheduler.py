@@ -0,0 +1,62 @@
+"""补充调度器：水位线滞回、优先级和并发上限"""
+
+import threading
+import time
+
+from scheduler import RefillScheduler
+
+
+def make_scheduler(watermarks, run_job=lambda size: 'complete', max_concurrent=2):
+    return RefillScheduler(list(watermarks), run_job=run_job, depth_of=lambda size: 0,
+                           watermarks=watermarks, max_concurrent=max_concurrent)
+
+
+def test_refill_starts_at_low_and_stops_at_high_watermark():
+    scheduler = make_scheduler({9: (1, 3)})
+    now = time.time()
+    assert scheduler._most_urgent(now, {9: 2}) is None  # 高于低水位，尚未开始补充
+    assert scheduler._most_urgent(now, {9: 1}) == 9
+    assert scheduler._most_urgent(now, {9: 2}) == 9  # 补充中，直到高水位
+    assert scheduler._most_urgent(now, {9: 3}) is None
+    assert scheduler._most_urgent(now, {9: 2}) is None  # 回到低水位之前不重新开始
+
+
+def test_without_traffic_sizes_furthest_below_low_watermark_go_first():
+    scheduler = make_scheduler({36: (2, 15), 25: (3, 30), 16: (10, 100), 9: (20, 200)})
+    now = time.time()
+    assert scheduler._most_urgent(now, {36: 0, 25: 0, 16: 0, 9: 0}) == 9
+    assert scheduler._most_urgent(now, {36: 0, 25: 0, 16: 0, 9: 15}) == 16
+
+
+def test_ties_go_to_the_faster_size():
+    scheduler = make_scheduler({16: (1, 3), 25: (1, 3)})
+    scheduler._stats[16]['latency'] = 2.0
+    scheduler._stats[25]['latency'] = 40.0
+    assert scheduler._most_urgent(time.time(), {16: 0, 25: 0}) == 16
+
+
+def test_requested_size_goes_before_idle_sizes():
+    scheduler = make_scheduler({4: (20, 200), 16: (10, 100)})
+    for _ in range(30):
+        scheduler.record_request(16)
+    assert scheduler._most_urgent(time.time(), {4: 0, 16: 5}) == 16
+
+
+def test_schedule_respects_max_concurrent():
+    release = threading.Event()
+    started = []
+
+    def run_job(size):
+        started.append(size)
+        release.wait(5)
+        return 'complete'
+
+    scheduler = make_scheduler({4: (1, 10), 9: (1, 10)}, run_job=run_job, max_concurrent=2)
+    scheduler._schedule()
+    scheduler._schedule()
+    assert scheduler.state()['running'] == 2
+    release.set()
+    deadline = time.time() + 5
+    while scheduler.state()['running'] and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(started) >= 2
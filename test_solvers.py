@@ -0,0 +1,66 @@
+"""求解后端：各后端对唯一解、多解、无解的判断一致"""
+
+import random
+
+import pytest
+
+from puzzle import Puzzle
+from solvers import get_backend
+
+BACKENDS = ['bitmask', 'z3', 'sat']
+
+UNIQUE = '530070000600195000098000060800060003400803001700020006060000280000419005000080079'
+SOLUTION = '534678912672195348198342567859761423426853791713924856961537284287419635345286179'
+
+
+def backend(name):
+    if name != 'bitmask':
+        pytest.importorskip('z3')
+    return get_backend(name)
+
+
+def grid(text):
+    return Puzzle.from_string(text).to_grid()
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_unique_puzzle_has_one_solution(name):
+    solver = backend(name)
+    assert solver.count_solutions(grid(UNIQUE)) == 1
+    assert solver.solve(grid(UNIQUE)) == grid(SOLUTION)
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_puzzle_missing_one_clue_is_not_unique(name):
+    puzzle = UNIQUE[:20] + '0' + UNIQUE[21:]  # 去掉第3行的9后有两个解
+    solutions = backend(name).solutions(grid(puzzle), limit=2)
+    assert len(solutions) == 2
+    assert solutions[0] != solutions[1]
+    assert all(Puzzle.from_grid(s).is_solved() for s in solutions)
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_conflicting_clues_have_no_solution(name):
+    puzzle = '55' + UNIQUE[2:]
+    assert backend(name).solve(grid(puzzle)) is None
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_full_grid_is_a_valid_solution(name):
+    # z3的整数编码生成9阶完整解要几秒，只检查4阶
+    for n in ((4,) if name == 'z3' else (4, 9)):
+        full = backend(name).full_grid(n, rng=random.Random(n))
+        assert Puzzle.from_grid(full).is_solved()
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_dug_puzzle_stays_unique_for_every_backend(name):
+    solution = grid(SOLUTION)
+    digger = backend(name).digger(solution)
+    cells = [(i, j) for i in range(9) for j in range(9)]
+    random.Random(0).shuffle(cells)
+    for i, j in cells[:50]:
+        digger.try_remove(i, j)
+    assert digger.clues < 81
+    for other in BACKENDS:
+        assert backend(other).count_solutions(digger.puzzle) == 1
@@ -0,0 +1,40 @@
+"""对称变换派生：派生的数独仍是有效的唯一解数独，且互不相同"""
+
+import random
+
+from puzzle import Puzzle
+from solvers import get_backend
+from transform import derive_puzzles, transform_pair
+
+PUZZLE = Puzzle.from_string(
+    '530070000600195000098000060800060003400803001700020006060000280000419005000080079')
+SOLUTION = Puzzle.from_string(
+    '534678912672195348198342567859761423426853791713924856961537284287419635345286179')
+
+
+def test_transform_keeps_puzzle_and_solution_consistent():
+    rng = random.Random(0)
+    for _ in range(20):
+        puzzle, solution = transform_pair(PUZZLE, SOLUTION, rng)
+        assert solution.is_solved()
+        assert puzzle.agrees_with(solution)
+        assert puzzle.clues == PUZZLE.clues
+
+
+def test_derived_puzzles_are_distinct_and_unique():
+    derived = derive_puzzles(PUZZLE, SOLUTION, 10, random.Random(1))
+    assert len(derived) == 10
+    puzzles = [puzzle.cells for puzzle, _ in derived]
+    assert len(set(puzzles)) == 10
+    assert PUZZLE.cells not in puzzles
+    backend = get_backend('bitmask')
+    for puzzle, solution in derived:
+        assert backend.solutions(puzzle.to_grid()) == [solution.to_grid()]
+
+
+def test_derive_stops_after_max_attempts():
+    # 4阶题目的变换种类有限，尝试次数用完时返回已派生的部分
+    solution = Puzzle.from_string('1234341221434321')
+    puzzle = Puzzle.from_string('1000000000000000')
+    derived = derive_puzzles(puzzle, solution, 100, random.Random(2), max_attempts=50)
+    assert 0 < len(derived) < 100
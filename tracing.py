@@ -0,0 +1,120 @@
+"""
+生成追踪和结构化日志
+- Trace: 一次生成任务的追踪记录，包含各阶段（生成完整解、构建约束、首次检查、挖空、唯一解验证）
+  的耗时、重试和检查次数，以及z3求解器的统计信息，由工作进程随数独一起返回
+- log_event: 以JSON行（每行一个JSON对象）输出日志，便于日志系统检索和汇总
+- profiled: 对采样的生成任务进行cProfile性能分析，结果保存为 .prof 文件
+"""
+
+import cProfile
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger('sudoku')
+
+
+class Trace:
+    """
+    一次生成任务的追踪记录
+    :param attributes: 任务属性，例如阶数、求解后端、挖空方式
+    """
+
+    def __init__(self, **attributes):
+        self.started = time.perf_counter()
+        self.attributes = dict(attributes)
+        self.spans = []
+        self.solver = {}  # 求解器统计信息
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        记录一个阶段的耗时，可以嵌套；阶段内抛出的异常会记录在 error 中
+        :return: 阶段记录字典，可以在阶段内补充属性
+        """
+        start = time.perf_counter()
+        record = dict(attributes, name=name, start=round(start - self.started, 6))
+        try:
+            yield record
+        except BaseException as e:
+            record['error'] = type(e).__name__
+            raise
+        finally:
+            record['duration'] = round(time.perf_counter() - start, 6)
+            self.spans.append(record)
+
+    def to_dict(self, counters=None):
+        """
+        转换为可序列化的字典
+        :param counters: 计数和累计耗时（generate_sudoku 的 stats 字典）
+        """
+        return dict(self.attributes,
+                    duration=round(time.perf_counter() - self.started, 6),
+                    spans=sorted(self.spans, key=lambda record: record['start']),
+                    counters=dict(counters or {}),
+                    solver=self.solver)
+
+
+def span(trace, name, **attributes):
+    """trace 为None时不记录的 Trace.span"""
+    return nullcontext({}) if trace is None else trace.span(name, **attributes)
+
+
+class JsonFormatter(logging.Formatter):
+    """把日志记录格式化为一行JSON：时间、级别、事件名、消息和附加字段"""
+
+    def format(self, record):
+        data = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created))
+                    + f'.{int(record.msecs):03d}',
+            'level': record.levelname.lower(),
+            'event': getattr(record, 'event', record.name),
+            'message': record.getMessage()
+        }
+        data.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def configure_logging(level='INFO', stream=None):
+    """为 sudoku 日志器添加JSON行输出（默认为标准输出），重复调用只添加一次"""
+    logger.setLevel(level)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        logger.addHandler(handler)
+    return logger
+
+
+def log_event(event, message='', level=logging.INFO, **fields):
+    """
+    输出一条JSON行日志
+    :param event: 事件名，例如 'generation'、'snapshot_loaded'
+    :param message: 供人阅读的说明
+    :param fields: 附加字段，需要可以序列化为JSON
+    """
+    logger.log(level, message, extra={'event': event, 'fields': fields})
+
+
+@contextmanager
+def profiled(path):
+    """
+    对代码块进行cProfile性能分析，结果保存到 path（可以用 pstats 或 snakeviz 查看），
+    代码块抛出异常时同样保存；path 为None时不分析
+    """
+    if not path:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        profile.dump_stats(path)